@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 APPLY_TUMBLE_MULTIPLIER = "applyMultiplierToTumble"
 UPDATE_GRID = "updateGrid"
 
@@ -9,6 +7,6 @@ def update_grid_mult_event(gamestate):
     event = {
         "index": len(gamestate.book.events),
         "type": UPDATE_GRID,
-        "gridMultipliers": deepcopy(gamestate.position_multipliers),
+        "gridMultipliers": [list(reel) for reel in gamestate.position_multipliers],
     }
     gamestate.book.add_event(event)
@@ -1,6 +1,5 @@
 """Handles generating game-boards from reelstrips"""
 
-import random
 from typing import List
 from src.state.state import GeneralGameState
 from src.calculations.statistics import get_random_outcome
@@ -17,14 +16,14 @@ class Board(GeneralGameState):
             bottom_symbols = []
         self.refresh_special_syms()
         self.reelstrip_id = get_random_outcome(
-            self.get_current_distribution_conditions()["reel_weights"][self.gametype]
+            self.get_current_distribution_conditions()["reel_weights"][self.gametype], rng=self.rng
         )
         self.reelstrip = self.config.reels[self.reelstrip_id]
         anticipation = [0] * self.config.num_reels
         board = [[]] * self.config.num_reels
         for i in range(self.config.num_reels):
             board[i] = [0] * self.config.num_rows[i]
-        reel_positions = [random.randrange(0, len(self.reelstrip[reel])) for reel in range(self.config.num_reels)]
+        reel_positions = [self.rng.randrange(0, len(self.reelstrip[reel])) for reel in range(self.config.num_reels)]
         padding_positions = [0] * self.config.num_reels
         first_scatter_reel = -1
         for reel in range(self.config.num_reels):
@@ -90,10 +89,10 @@ class Board(GeneralGameState):
 
         reel_positions = [None] * self.config.num_reels
         for r, s in force_stop_positions.items():
-            reel_positions[r] = s - random.randint(0, self.config.num_rows[r] - 1)
+            reel_positions[r] = s - self.rng.randint(0, self.config.num_rows[r] - 1)
         for r, _ in enumerate(reel_positions):
             if reel_positions[r] is None:
-                reel_positions[r] = random.randrange(0, len(self.reelstrip[r]))
+                reel_positions[r] = self.rng.randrange(0, len(self.reelstrip[r]))
 
         padding_positions = [0] * self.config.num_reels
         first_scatter_reel = -1
@@ -199,7 +198,9 @@ class Board(GeneralGameState):
             self.get_current_distribution_conditions()["force_freegame"]
             and self.gametype == self.config.basegame_type
         ):
-            num_scatters = get_random_outcome(self.get_current_distribution_conditions()["scatter_triggers"])
+            num_scatters = get_random_outcome(
+                self.get_current_distribution_conditions()["scatter_triggers"], rng=self.rng
+            )
             self.force_special_board(trigger_symbol, num_scatters)
         elif (
             not (self.get_current_distribution_conditions()["force_freegame"])
@@ -247,7 +248,7 @@ class Board(GeneralGameState):
         Helper function for forcing special (or name specific) symbols
         """
         reelstrip_id = get_random_outcome(
-            self.get_current_distribution_conditions()["reel_weights"][self.gametype]
+            self.get_current_distribution_conditions()["reel_weights"][self.gametype], rng=self.rng
         )
         reelstops = self.get_syms_on_reel(reelstrip_id, force_criteria)
 
@@ -258,8 +259,8 @@ class Board(GeneralGameState):
         while len(force_stop_positions) != num_force_syms:
             possible_reels = [i for i in range(self.config.num_reels) if sym_prob[i] > 0]
             possible_probs = [p for p in sym_prob if p > 0]
-            chosen_reel = random.choices(possible_reels, possible_probs)[0]
-            chosen_stop = random.choice(reelstops[chosen_reel])
+            chosen_reel = self.rng.choices(possible_reels, possible_probs)[0]
+            chosen_stop = self.rng.choice(reelstops[chosen_reel])
             sym_prob[chosen_reel] = 0
             force_stop_positions[int(chosen_reel)] = int(chosen_stop)
 
@@ -267,7 +268,13 @@ class Board(GeneralGameState):
         self.force_board_from_reelstrips(reelstrip_id, force_stop_positions)
 
     def get_syms_on_reel(self, reel_id: str, target_symbol: str) -> List[List]:
-        """Return reelstop positions for a specific symbol name."""
+        """Return reelstop positions for a specific symbol name, cached per reelstrip and not to be modified."""
+        if (reel_id, target_symbol) not in self.reel_symbol_positions:
+            self.reel_symbol_positions[(reel_id, target_symbol)] = self.find_syms_on_reel(reel_id, target_symbol)
+        return self.reel_symbol_positions[(reel_id, target_symbol)]
+
+    def find_syms_on_reel(self, reel_id: str, target_symbol: str) -> List[List]:
+        """Search a reelstrip for the positions of a symbol name, or of all symbols with a special property."""
         reel = self.config.reels[reel_id]
         reelstop_positions = [[] for _ in range(self.config.num_reels)]
         for r in range(self.config.num_reels):
@@ -1,13 +1,42 @@
 import random
+from bisect import bisect_left
 from typing import Union
 
+# cumulative weights of preloaded read-only distributions, keyed by id(distribution)
+DISTRIBUTION_SAMPLERS = {}
 
-def get_random_outcome(distribution: dict, totalWeight: float = None) -> Union[float, int]:
-    """Returns a value from a distibution passed as a dictionary: {value : weight, ...}"""
+
+def preload_distribution(distribution: dict) -> None:
+    """
+    Precompute the values and cumulative weights of a distribution which is not modified while simulating.
+    Draws from it give the same outcomes as the linear search, without summing the weights on every call.
+    """
+    cumulative, cumulative_weights = 0.0, []
+    for weight in distribution.values():
+        cumulative += weight
+        cumulative_weights.append(cumulative)
+    DISTRIBUTION_SAMPLERS[id(distribution)] = (
+        distribution,
+        list(distribution.keys()),
+        cumulative_weights,
+        sum(distribution.values()),
+    )
+
+
+def get_random_outcome(distribution: dict, totalWeight: float = None, rng=random) -> Union[float, int]:
+    """Returns a value from a distibution passed as a dictionary: {value : weight, ...}, drawn using rng."""
     assert isinstance(distribution, dict), "distribution must be of type: dict "
+    sampler = DISTRIBUTION_SAMPLERS.get(id(distribution))
+    if sampler is not None and sampler[0] is distribution and totalWeight is None:
+        _, values, cumulative_weights, total_weight = sampler
+        index = bisect_left(cumulative_weights, rng.uniform(0, total_weight))
+        if index < len(values):
+            return values[index]
+        return Exception("error drawing item from distribution")
+
     if totalWeight is None:
         totalWeight = sum(distribution.values())
-    roll = random.uniform(0, totalWeight)
+    roll = rng.uniform(0, totalWeight)
     cumulative = 0.0
     for value, weight in distribution.items():
         cumulative += weight
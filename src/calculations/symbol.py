@@ -13,8 +13,8 @@ class SymbolStorage:
             self.symbols[symbol] = Symbol(self.config, symbol)
 
     def create_symbol_state(self, symbol_name: str) -> object:
-        """Create new symbol class instance."""
-        return Symbol(self.config, symbol_name)
+        """Create new symbol class instance, copied from the symbol's prototype so the paytable is only parsed once."""
+        return self.get_symbol(symbol_name).copy_prototype()
 
     def get_symbol(self, name: str) -> object:
         """Retrieve symbol class from name."""
@@ -41,6 +41,13 @@ class Symbol:
 
         self.assign_paying_bool(config)
 
+    def copy_prototype(self) -> "Symbol":
+        """New symbol with the same name-derived attributes and no registered special functions."""
+        symbol = Symbol.__new__(Symbol)
+        symbol.__dict__.update(self.__dict__)
+        symbol.special_functions = []
+        return symbol
+
     def register_special_function(self, special_function: callable) -> None:
         """Assign special symbol function."""
         self.special_functions.append(special_function)
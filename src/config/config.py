@@ -49,6 +49,12 @@ class Config:
         self.padding_reels = {}  # symbol configuration displayed before the board reveal
 
         self.write_event_list = True
+        # Keep a copy of every book event and raise if an event is modified after it was added, for debugging
+        self.check_book_events = False
+
+        # Per-simulation random streams, 'compat' reproduces books seeded with random.seed(sim + 1)
+        self.rng_mode = "compat"
+        self.rng_seed = 0
 
         self.bet_modes = []
         self.opt_params = {None: None}
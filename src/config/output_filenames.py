@@ -23,6 +23,7 @@ class OutputFiles:
     def setup_output_directories(self):
         """Entrypoint for saving all output files."""
         self.library_path = os.path.join(PATH_TO_GAMES, str(self.game_config.game_id), "library")
+        # created only when modes are simulated, so a fully cached run leaves no temp directory behind
         self.temp_path = os.path.join(self.library_path, "temp_multi_threaded_files")
         self.config_path = os.path.join(self.library_path, "configs")
         self.force_path = os.path.join(self.library_path, "forces")
@@ -34,6 +35,7 @@ class OutputFiles:
         self.compressed_path = self.publish_path  # Required RGS files
         self.final_lookup_path = self.publish_path  # Required RGS files
         self.optimization_result_path = os.path.join(self.optimization_path, "trial_results")
+        self.profile_path = os.path.join(self.library_path, "profiling")
 
         all_paths = [
             "library_path",
@@ -42,7 +44,6 @@ class OutputFiles:
             "lookup_path",
             "config_path",
             "force_path",
-            "temp_path",
             "optimization_path",
             "optimization_result_path",
             "publish_path",
@@ -119,30 +120,39 @@ class OutputFiles:
                 },
             }
 
-    def get_temp_multi_thread_name(self, betmode: str, thread_index: int, repeat_count: int, compress: bool):
+    def get_temp_multi_thread_name(self, betmode: str, shard_index: int, compress: bool):
         """Naming convention for temp book files."""
         if compress:
-            filename = f"books_{betmode}_{thread_index}_{repeat_count}.jsonl.zst"
+            filename = f"books_{betmode}_{shard_index}.jsonl.zst"
         elif not (compress) and self.game_config.output_regular_json:
-            filename = f"books_{betmode}_{thread_index}_{repeat_count}.json"
+            filename = f"books_{betmode}_{shard_index}.json"
         elif not (compress) and not (self.game_config.output_regular_json):
-            filename = f"books_{betmode}_{thread_index}_{repeat_count}.jsonl"
+            filename = f"books_{betmode}_{shard_index}.jsonl"
         else:
             raise RuntimeError("Error in logic generating book name")
 
         return os.path.join(self.temp_path, filename)
 
-    def get_temp_lookup_name(self, betmode: str, thread_index: int, repeat_count: int):
-        """Naming convention for temp lookup files."""
-        return os.path.join(self.temp_path, f"lookUpTable_{betmode}_{thread_index}_{repeat_count}")
+    def get_final_mode_names(self, betmode: str, compress: bool):
+        """Simulation outputs of a mode which can be reused when its inputs are unchanged."""
+        return [
+            self.get_final_book_name(betmode, compress),
+            self.get_final_lookup_name(betmode),
+            self.get_final_segmented_name(betmode),
+            os.path.join(self.force_path, f"force_record_{betmode}.json"),
+        ]
+
+    def get_sim_cache_name(self):
+        """Fingerprints of the inputs used to create each mode's outputs."""
+        return os.path.join(self.library_path, "sim_cache.json")
 
-    def get_temp_segmented_name(self, betmode: str, thread_index: int, repeat_count: int):
-        """Naming convention for temp segmented lookup files."""
-        return os.path.join(self.temp_path, f"lookUpTableSegmented_{betmode}_{thread_index}_{repeat_count}")
+    def get_criteria_costs_name(self):
+        """Seconds per accepted sim of each criteria measured by previous runs, used to order shards."""
+        return os.path.join(self.library_path, "criteria_costs.json")
 
-    def get_temp_force_name(self, betmode: str, thread_index: int, repeat_count: int):
-        """Naming convention for temp force files."""
-        return os.path.join(self.temp_path, f"force_{betmode}_{thread_index}_{repeat_count}.json")
+    def get_run_manifest_name(self):
+        """Record of finished shards, used to resume interrupted runs."""
+        return os.path.join(self.temp_path, "run_manifest.jsonl")
 
     def get_final_book_name(self, betmode: str, compress: bool):
         """Returns final simulation books output name."""
@@ -1,6 +1,5 @@
 """Defines reusable events"""
 
-from copy import deepcopy
 from src.events.event_constants import EventConstants
 
 
@@ -35,9 +34,9 @@ def reveal_event(gamestate):
         "index": len(gamestate.book.events),
         "type": EventConstants.REVEAL.value,
         "board": board_client,
-        "paddingPositions": gamestate.reel_positions,
+        "paddingPositions": list(gamestate.reel_positions),
         "gameType": gamestate.gametype,
-        "anticipation": gamestate.anticipation,
+        "anticipation": list(gamestate.anticipation),
     }
     gamestate.book.add_event(event)
 
@@ -51,12 +50,10 @@ def fs_trigger_event(
     """Triggers feature game from the basegame."""
     assert basegame_trigger != freegame_trigger, "must set either basegame_trigger or freeSpinTrigger to = True"
     event = {}
-    scatter_positions = []
-    for reel, _ in enumerate(gamestate.special_syms_on_board["scatter"]):
-        scatter_positions.append(gamestate.special_syms_on_board["scatter"][reel])
-    if include_padding_index:
-        for pos in scatter_positions:
-            pos["row"] += 1
+    row_offset = 1 if include_padding_index else 0
+    scatter_positions = [
+        {**pos, "row": pos["row"] + row_offset} for pos in gamestate.special_syms_on_board["scatter"]
+    ]
 
     if basegame_trigger:
         event = {
@@ -138,37 +135,35 @@ def win_info_event(gamestate, include_padding_index=True):
     """
     include_padding_index: starts winning-symbol positions at row=1, to account for top/bottom symbol inclusion in board
     """
-    win_data_copy = {}
-    win_data_copy["wins"] = deepcopy(gamestate.win_data["wins"])
-    for idx, w in enumerate(win_data_copy["wins"]):
+    wins = []
+    for w in gamestate.win_data["wins"]:
+        win = dict(w)
+        win["win"] = int(round(min(w["win"], gamestate.config.wincap) * 100, 0))
         if include_padding_index:
-            new_positions = []
-            for p in w["positions"]:
-                new_positions.append({"reel": p["reel"], "row": p["row"] + 1})
+            win["positions"] = [{"reel": p["reel"], "row": p["row"] + 1} for p in w["positions"]]
         else:
-            new_positions = w["positions"]
-
-        win_data_copy["wins"][idx]["win"] = int(
-            round(min(win_data_copy["wins"][idx]["win"], gamestate.config.wincap) * 100, 0)
-        )
-        win_data_copy["wins"][idx]["positions"] = new_positions
-        if "meta" in win_data_copy["wins"][idx]:
-            win_data_copy["wins"][idx]["meta"]["winWithoutMult"] = int(
+            win["positions"] = [dict(p) for p in w["positions"]]
+        if "meta" in w:
+            win["meta"] = dict(w["meta"])
+            win["meta"]["winWithoutMult"] = int(
                 int(
                     min(
-                        win_data_copy["wins"][idx]["meta"]["winWithoutMult"] * 100,
+                        w["meta"]["winWithoutMult"] * 100,
                         gamestate.config.wincap * 100,
                     ),
                 )
             )
-            if "overlay" in win_data_copy["wins"][idx]["meta"] and include_padding_index:
-                win_data_copy["wins"][idx]["meta"]["overlay"]["row"] += 1
+            if "overlay" in w["meta"]:
+                win["meta"]["overlay"] = dict(w["meta"]["overlay"])
+                if include_padding_index:
+                    win["meta"]["overlay"]["row"] += 1
+        wins.append(win)
 
     event = {
         "index": len(gamestate.book.events),
         "type": EventConstants.WIN_DATA.value,
         "totalWin": int(round(min(gamestate.win_data["totalWin"], gamestate.config.wincap) * 100, 0)),
-        "wins": win_data_copy["wins"],
+        "wins": wins,
     }
     gamestate.book.add_event(event)
 
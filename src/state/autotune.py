@@ -0,0 +1,177 @@
+"""Choose batch sizes and worker counts from measured simulation cost, available memory and cpus."""
+
+import os
+import math
+import time
+import tracemalloc
+from warnings import warn
+from typing import Dict, Tuple, Union
+
+from src.state.dry_run import format_bytes, sample_criteria
+from src.state.preload import fresh_gamestate, preload_gamestate
+
+AUTO = "auto"
+AUTOTUNE_SIMS_PER_CRITERIA = 20
+TARGET_SHARD_SECONDS = 20.0
+MIN_AUTO_BATCH_SIZE = 100
+MAX_AUTO_BATCH_SIZE = 100000
+MEMORY_FRACTION = 0.75
+# interpreter and imported modules of a worker, on top of its gamestate and simulations
+WORKER_BASE_MEMORY = 64 * 2**20
+RETIRE_INTERVAL = 30.0
+
+
+def get_available_cpus() -> int:
+    """Cpus this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_available_memory() -> Union[int, None]:
+    """Bytes of memory available to new processes without swapping, or None if it cannot be determined."""
+    try:
+        with open("/proc/meminfo", "r", encoding="UTF-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def round_batch_size(batch_size: float) -> int:
+    """Largest 1, 2 or 5 times a power of ten not above batch_size, so small changes in timing give the same shards."""
+    batch_size = min(max(batch_size, MIN_AUTO_BATCH_SIZE), MAX_AUTO_BATCH_SIZE)
+    scale = 10 ** int(math.floor(math.log10(batch_size)))
+    return max(step * scale for step in (1, 2, 5) if step * scale <= batch_size)
+
+
+def get_state_memory(gamestate: object) -> int:
+    """Python memory of the fresh gamestate copy each shard runs on."""
+    tracemalloc.start()
+    try:
+        state_copy = fresh_gamestate(gamestate)
+        state_memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del state_copy
+    return state_memory
+
+
+def choose_run_settings(
+    mode_costs: Dict[str, dict],
+    worker_memory: int,
+    num_cpus: int,
+    available_memory: Union[int, None],
+    threads: Union[int, str] = AUTO,
+    batch_size: Union[int, str] = AUTO,
+) -> Tuple[int, Dict[str, int]]:
+    """
+    Threads and per-mode batch sizes for the measured cost of each mode.
+    mode_costs hold each mode's average seconds_per_sim and retained_memory per sim and its largest peak_memory.
+    Workers use at most MEMORY_FRACTION of the available memory, each needing worker_memory plus its peak sim and a
+    shard of retained sim results. Threads are limited by cpus and by memory at MIN_AUTO_BATCH_SIZE, batches
+    take about TARGET_SHARD_SECONDS unless memory requires smaller shards. A given int threads or batch_size is kept.
+    """
+    budget = None if available_memory is None else available_memory * MEMORY_FRACTION
+    peak_memory = max((cost["peak_memory"] for cost in mode_costs.values()), default=0)
+    if threads == AUTO:
+        threads = num_cpus
+        if budget is not None:
+            smallest_worker = worker_memory + peak_memory + MIN_AUTO_BATCH_SIZE * max(
+                (cost["retained_memory"] for cost in mode_costs.values()), default=0
+            )
+            threads = min(threads, int(budget // max(smallest_worker, 1)))
+        threads = max(threads, 1)
+
+    batch_sizes = {}
+    for betmode, cost in mode_costs.items():
+        if batch_size != AUTO:
+            batch_sizes[betmode] = batch_size
+            continue
+        mode_batch = TARGET_SHARD_SECONDS / max(cost["seconds_per_sim"], 1e-9)
+        if budget is not None and cost["retained_memory"] > 0:
+            free_worker_memory = budget / threads - worker_memory - cost["peak_memory"]
+            mode_batch = min(mode_batch, free_worker_memory / cost["retained_memory"])
+        batch_sizes[betmode] = round_batch_size(mode_batch)
+    return threads, batch_sizes
+
+
+def tune_run(
+    gamestate: object,
+    mode_criteria_counts: Dict[str, Dict[str, int]],
+    threads: Union[int, str] = AUTO,
+    batch_size: Union[int, str] = AUTO,
+    sims_per_criteria: int = AUTOTUNE_SIMS_PER_CRITERIA,
+) -> Tuple[int, Dict[str, int], Union[int, None]]:
+    """
+    Measure every criteria of the requested modes on a few sims and choose threads and per-mode batch sizes.
+    Criteria are weighted by the number of sims allocated to them, so rare but heavy criteria are accounted for.
+    Also returns the available memory below which workers are retired while the run is in progress.
+    """
+    preload_gamestate(gamestate)
+    mode_costs = {}
+    for betmode, criteria_counts in mode_criteria_counts.items():
+        cost = {"seconds_per_sim": 0.0, "retained_memory": 0.0, "peak_memory": 0}
+        for criteria_index, (criteria, count) in enumerate(criteria_counts.items()):
+            num_sims = max(min(sims_per_criteria, count), 1)
+            first_sim = criteria_index * sims_per_criteria
+            sample = sample_criteria(gamestate, betmode, criteria, num_sims, first_sim=first_sim)
+            weight = count / max(sum(criteria_counts.values()), 1)
+            cost["seconds_per_sim"] += weight * sample["seconds_per_sim"]
+            cost["retained_memory"] += weight * sample["retained_memory"]
+            cost["peak_memory"] = max(cost["peak_memory"], sample["peak_memory"])
+        mode_costs[betmode] = cost
+
+    available_memory = get_available_memory()
+    if available_memory is None:
+        warn("Available memory could not be determined, only cpus are used to choose the number of workers.")
+    threads, batch_sizes = choose_run_settings(
+        mode_costs,
+        WORKER_BASE_MEMORY + get_state_memory(gamestate),
+        get_available_cpus(),
+        available_memory,
+        threads,
+        batch_size,
+    )
+    print(
+        "Auto-tuned",
+        threads,
+        "threads, batch sizes",
+        batch_sizes,
+        "with",
+        format_bytes(available_memory) if available_memory is not None else "unknown",
+        "available memory",
+    )
+    min_available_memory = None
+    if available_memory is not None:
+        min_available_memory = int(available_memory * (1 - MEMORY_FRACTION) / 2)
+    return threads, batch_sizes, min_available_memory
+
+
+class MemoryGuard:
+    """
+    Retires workers while available memory is below min_available_memory, for runs whose later shards turn out
+    heavier than the tuning sample. A retired worker finishes its current shard and takes no further shards.
+    At most one worker is retired per RETIRE_INTERVAL, so a retirement can take effect first.
+    """
+
+    def __init__(self, scheduler: object, min_available_memory: int):
+        self.scheduler = scheduler
+        self.min_available_memory = min_available_memory
+        self.last_retired = 0.0
+
+    def check(self) -> None:
+        """Retire a worker if memory is low."""
+        if time.time() - self.last_retired < RETIRE_INTERVAL or self.scheduler.get_worker_limit() <= 1:
+            return
+        available_memory = get_available_memory()
+        if available_memory is not None and available_memory < self.min_available_memory:
+            workers = self.scheduler.get_worker_limit() - 1
+            self.scheduler.limit_workers(workers)
+            self.last_retired = time.time()
+            warn(f"Only {format_bytes(available_memory)} memory available, reducing to {workers} workers.")
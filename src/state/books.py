@@ -6,7 +6,7 @@ from copy import deepcopy
 class Book:
     "Stores simulation information."
 
-    def __init__(self, book_id: int, criteria: str):
+    def __init__(self, book_id: int, criteria: str, check_events: bool = False):
         "Initialize simulation book"
         self.id = book_id
         self.payout_multiplier = 0.0
@@ -14,18 +14,41 @@ class Book:
         self.criteria = criteria
         self.basegame_wins = 0.0
         self.freegame_wins = 0.0
+        self.check_events = check_events
+        self.event_snapshots = []
 
     def add_event(self, event: dict):
-        "Append event to book."
-        self.events.append(deepcopy(event))
+        """
+        Append event to book. The book takes ownership of the event without copying it, so the event must be built
+        from new containers rather than referencing gamestate data which changes later.
+        With check_events, a copy is kept and to_json raises if an event was changed after it was added.
+        """
+        self.events.append(event)
+        if self.check_events:
+            self.event_snapshots.append(deepcopy(event))
 
     def append_book_items(self, event_id: int, appended_info: dict):
         "Modify an existing book event at position 'event_id'"
         for k, v in appended_info.items():
             self.events[event_id][k] = v
+            if self.check_events:
+                self.event_snapshots[event_id][k] = deepcopy(v)
+
+    def verify_events(self):
+        "Raise if an event was changed after it was added, other than through append_book_items."
+        if len(self.events) != len(self.event_snapshots):
+            raise RuntimeError(f"Events of book {self.id} were added without add_event.")
+        for event, snapshot in zip(self.events, self.event_snapshots):
+            if event != snapshot:
+                raise RuntimeError(
+                    f"Event {snapshot.get('index')} ({snapshot.get('type')}) of book {self.id} was modified after it "
+                    "was added, build events from new containers instead of referencing gamestate data."
+                )
 
     def to_json(self):
         "Return JSON-ready object."
+        if self.check_events:
+            self.verify_events()
         json_book = {
             "id": self.id,
             "payoutMultiplier": int(round(self.payout_multiplier * 100, 0)),
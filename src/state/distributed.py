@@ -0,0 +1,178 @@
+"""Simulate ranges of a mode on separate machines and merge the resulting shard files."""
+
+import os
+import json
+import shutil
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from src.state.run_sims import (
+    assign_sim_criteria,
+    get_sim_shards,
+    get_sim_splits,
+    get_sim_tasks,
+    run_sim_pool,
+)
+from src.state.sim_cache import SimCache, get_mode_fingerprint, get_sources_hash
+from src.write_data.write_data import ShardMerger, get_sha_256
+
+SHARD_METADATA_SUFFIX = ".shard.json"
+
+
+def get_range_label(sim_range: Tuple[int, int]) -> str:
+    """Shard file label for simulations [start, end)."""
+    return f"{sim_range[0]}-{sim_range[1]}"
+
+
+def write_shard_files(
+    output_files: object,
+    shard_dir: str,
+    shard_index: int,
+    shard_result: dict,
+    metadata: dict,
+) -> None:
+    """
+    Move a finished shard's books out of the temp directory and describe it in a metadata file.
+    The metadata also holds the shard's force keys and lookup, force and event payloads.
+    """
+    betmode, compress = metadata["betmode"], metadata["compress"]
+    label = get_range_label(metadata["sim_range"])
+    temp_name = output_files.get_temp_multi_thread_name(betmode, shard_index, compress)
+    shard_name = os.path.basename(output_files.get_temp_multi_thread_name(betmode, label, compress))
+    shutil.move(temp_name, os.path.join(shard_dir, shard_name))
+    files = {"books": {"name": shard_name, "sha256": shard_result["files"][os.path.basename(temp_name)]}}
+
+    metadata = {**metadata, **shard_result, "files": files}
+    with open(os.path.join(shard_dir, f"{betmode}_{label}{SHARD_METADATA_SUFFIX}"), "w", encoding="UTF-8") as f:
+        f.write(json.dumps(metadata, indent=4))
+
+
+def simulate_sim_range(
+    gamestate: object,
+    config: object,
+    betmode: str,
+    num_sims: int,
+    sim_range: Tuple[int, int],
+    shard_dir: str,
+    batch_size: int,
+    threads: int,
+    compress: bool = True,
+) -> None:
+    """
+    Simulate sims [start, end) of a mode with num_sims total simulations.
+    Criteria are allocated over all num_sims, so ranges run on different machines combine into the full mode.
+    Each shard is written to shard_dir along with a metadata file describing its range and inputs.
+    """
+    start, end = sim_range
+    assert 0 <= start < end <= num_sims, f"sim range {sim_range} must be within [0, {num_sims})"
+    output_files = gamestate.output_files
+    # separate temp directory per range, so several ranges can be simulated on one host
+    output_files.temp_path = os.path.join(output_files.temp_path, f"{betmode}_{get_range_label(sim_range)}")
+    output_files.check_folder_exists(shard_dir)
+    output_files.check_folder_exists(output_files.temp_path)
+
+    fingerprint = get_mode_fingerprint(config, betmode, num_sims, compress, get_sources_hash(config.game_id))
+    sim_allocation = assign_sim_criteria(get_sim_splits(gamestate, num_sims, betmode), num_sims)
+    sim_chunks = [(start + first, start + last) for first, last in get_sim_shards(end - start, batch_size, threads)]
+    mode_plans = {betmode: (sim_chunks, sim_allocation)}
+
+    def write_result(result: tuple) -> None:
+        (_, shard_index), shard_result, _ = result
+        metadata = {
+            "game_id": config.game_id,
+            "betmode": betmode,
+            "num_sims": num_sims,
+            "sim_range": sim_chunks[shard_index],
+            "compress": compress,
+            "fingerprint": fingerprint,
+        }
+        write_shard_files(output_files, shard_dir, shard_index, shard_result, metadata)
+
+    print("Simulating", config.game_id, "in", betmode, "for sims", get_range_label(sim_range))
+    run_sim_pool(
+        threads,
+        config.game_id,
+        gamestate,
+        mode_plans,
+        get_sim_tasks(mode_plans),
+        on_result=write_result,
+        compress=compress,
+        write_event_list=config.write_event_list,
+    )
+    shutil.rmtree(output_files.temp_path)
+
+
+def load_shard_metadata(shard_dir: str) -> Dict[str, List[dict]]:
+    """Metadata of all shards in a directory, grouped by mode and ordered by simulation range."""
+    shards = defaultdict(list)
+    for fname in sorted(os.listdir(shard_dir)):
+        if fname.endswith(SHARD_METADATA_SUFFIX):
+            with open(os.path.join(shard_dir, fname), "r", encoding="UTF-8") as f:
+                metadata = json.load(f)
+            shards[metadata["betmode"]].append(metadata)
+    for mode_shards in shards.values():
+        mode_shards.sort(key=lambda metadata: metadata["sim_range"][0])
+    return shards
+
+
+def verify_mode_shards(mode_shards: List[dict], shard_dir: str) -> None:
+    """Shards must come from the same run inputs, cover every simulation once and be unmodified."""
+    first = mode_shards[0]
+    for metadata in mode_shards:
+        for key in ("game_id", "num_sims", "compress", "fingerprint"):
+            if metadata[key] != first[key]:
+                raise RuntimeError(f"Shard {get_range_label(metadata['sim_range'])} has a different {key}.")
+        for details in metadata["files"].values():
+            if get_sha_256(os.path.join(shard_dir, details["name"])) != details["sha256"]:
+                raise RuntimeError(f"Shard file {details['name']} does not match its recorded hash.")
+
+    expected_start = 0
+    for metadata in mode_shards:
+        start, end = metadata["sim_range"]
+        if start != expected_start:
+            raise RuntimeError(f"Missing or overlapping sims in {first['betmode']} at sim {expected_start}.")
+        expected_start = end
+    if expected_start != first["num_sims"]:
+        raise RuntimeError(f"Missing sims in {first['betmode']} from sim {expected_start}.")
+
+
+def merge_sim_shards(gamestate: object, config: object, shard_dir: str) -> None:
+    """Combine shards from a directory into the final books, lookup tables and force files of each mode."""
+    output_files = gamestate.output_files
+    shards = load_shard_metadata(shard_dir)
+    unknown_modes = set(shards) - set(bm.get_name() for bm in config.bet_modes)
+    if len(unknown_modes) > 0:
+        raise RuntimeError(f"Shards found for unknown modes: {sorted(unknown_modes)}")
+
+    sim_cache = SimCache(output_files.get_sim_cache_name())
+    sources_hash = get_sources_hash(config.game_id)
+    for betmode in [bm.get_name() for bm in config.bet_modes if bm.get_name() in shards]:
+        mode_shards = shards[betmode]
+        verify_mode_shards(mode_shards, shard_dir)
+        num_sims, compress, fingerprint = (mode_shards[0][key] for key in ("num_sims", "compress", "fingerprint"))
+        if fingerprint != get_mode_fingerprint(config, betmode, num_sims, compress, sources_hash):
+            raise RuntimeError(f"Shards for {betmode} were simulated with different game inputs.")
+
+        shard_files = [os.path.join(shard_dir, metadata["files"]["books"]["name"]) for metadata in mode_shards]
+        merger = ShardMerger(
+            config.game_id,
+            betmode,
+            output_files,
+            len(mode_shards),
+            compress,
+            shard_files=shard_files,
+            write_event_list=config.write_event_list,
+        )
+        for shard_index, metadata in enumerate(mode_shards):
+            merger.add_shard(shard_index, metadata)
+        merger.finalize()
+
+        gamestate.combine([metadata["force_keys"] for metadata in mode_shards], betmode)
+        gamestate.get_betmode(betmode).lock_force_keys()
+        sim_cache.update(
+            betmode,
+            fingerprint,
+            output_files.get_final_mode_names(betmode, compress),
+            gamestate.get_betmode(betmode).get_force_keys(),
+        )
+    sim_cache.save()
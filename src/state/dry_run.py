@@ -0,0 +1,205 @@
+"""Estimate the runtime, output size and memory of a run from a small sample of every criteria."""
+
+import os
+import json
+import time
+import tracemalloc
+from typing import Dict
+
+import zstandard as zstd
+
+from src.wins.win_manager import WinManager
+from src.state.preload import fresh_gamestate, preload_gamestate
+from src.state.sim_results import SimResults
+from src.write_data.write_data import get_lookup_rows, get_pay_split_rows
+
+DRY_RUN_SIMS_PER_CRITERIA = 100
+MEMORY_SAMPLE_SIMS = 10
+
+
+class SampleBookWriter:
+    """Stands in for the shard BookWriter, measuring each book instead of writing it."""
+
+    def __init__(self):
+        self.compressor = zstd.ZstdCompressor().compressobj()
+        self.book_bytes = 0
+        self.compressed_bytes = 0
+
+    def write(self, book: dict) -> None:
+        """Count the bytes of a book, uncompressed and as part of a compressed stream."""
+        data = (json.dumps(book) + "\n").encode("UTF-8")
+        self.book_bytes += len(data)
+        self.compressed_bytes += len(self.compressor.compress(data))
+
+    def close(self) -> None:
+        """Count the end of the compressed stream."""
+        self.compressed_bytes += len(self.compressor.flush())
+
+
+def get_sample_state(gamestate: object, betmode: str, criteria: str) -> object:
+    """Fresh gamestate set up to simulate a single criteria of a mode without writing files."""
+    sample_state = fresh_gamestate(gamestate)
+    sample_state.win_manager = WinManager(
+        gamestate.config.basegame_type, gamestate.config.freegame_type, gamestate.get_betmode(betmode).get_wincap()
+    )
+    sample_state.betmode = betmode
+    sample_state.criteria = criteria
+    sample_state.sim_results = SimResults()
+    sample_state.recorded_events = {}
+    sample_state.temp_wins = []
+    sample_state.book_writer = SampleBookWriter()
+    return sample_state
+
+
+def sample_criteria(gamestate: object, betmode: str, criteria: str, num_sims: int, first_sim: int = 0) -> dict:
+    """
+    Simulate num_sims sims of a criteria, measuring time and repeated attempts per accepted sim and the size of
+    its books and lookup rows. Peak and retained python memory per sim are traced over MEMORY_SAMPLE_SIMS separate
+    sims, so tracing does not slow down the timed run.
+    """
+    sample_state = get_sample_state(gamestate, betmode, criteria)
+    attempts = 0
+    start_time = time.perf_counter()
+    for sim in range(first_sim, first_sim + num_sims):
+        sample_state.run_spin(sim)
+        attempts += sample_state.attempt + 1
+    elapsed = time.perf_counter() - start_time
+    sample_state.book_writer.close()
+
+    # the first traced sim warms up the gamestate, retained memory is measured as the growth over later sims
+    memory_state = get_sample_state(gamestate, betmode, criteria)
+    peak_memory = 0
+    tracemalloc.start()
+    try:
+        memory_state.run_spin(first_sim)
+        baseline = tracemalloc.get_traced_memory()[0]
+        for sim in range(first_sim + 1, first_sim + MEMORY_SAMPLE_SIMS + 1):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            memory_state.run_spin(sim)
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1] - before)
+        retained_memory = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "sims": num_sims,
+        "seconds_per_sim": elapsed / num_sims,
+        "attempts_per_sim": attempts / num_sims,
+        "book_bytes": sample_state.book_writer.book_bytes / num_sims,
+        "compressed_book_bytes": sample_state.book_writer.compressed_bytes / num_sims,
+        "lookup_bytes": len(get_lookup_rows(sample_state)) / num_sims,
+        "segmented_bytes": len(get_pay_split_rows(sample_state)) / num_sims,
+        "peak_memory": peak_memory,
+        "retained_memory": max(retained_memory, 0) / MEMORY_SAMPLE_SIMS,
+    }
+
+
+def project_run(
+    samples: Dict[str, Dict[str, dict]],
+    mode_criteria_counts: Dict[str, Dict[str, int]],
+    threads: int,
+    shard_size: int,
+    compress: bool,
+    num_cpus: int = None,
+) -> dict:
+    """
+    Scale per-criteria samples to the requested number of sims of each criteria.
+    Wall time assumes workers scale linearly with threads, up to num_cpus. Disk use covers the final books, lookup
+    tables and the optimized lookup table copy, the peak also holds the temp book shards removed once the run finishes.
+    Each worker holds the largest single sim peak plus a shard of sim results at the mode's average retained
+    memory per sim, the parent holds the criteria allocation of every mode at one byte per sim.
+    """
+    book_key = "compressed_book_bytes" if compress else "book_bytes"
+    modes = {}
+    for betmode, criteria_counts in mode_criteria_counts.items():
+        mode = {
+            "sims": 0,
+            "attempts": 0.0,
+            "cpu_seconds": 0.0,
+            "book_bytes": 0.0,
+            "lookup_bytes": 0.0,
+            "retained_memory": 0.0,
+        }
+        for criteria, count in criteria_counts.items():
+            sample = samples[betmode][criteria]
+            mode["sims"] += count
+            mode["attempts"] += count * sample["attempts_per_sim"]
+            mode["cpu_seconds"] += count * sample["seconds_per_sim"]
+            mode["book_bytes"] += count * sample[book_key]
+            mode["lookup_bytes"] += count * (2 * sample["lookup_bytes"] + sample["segmented_bytes"])
+            mode["retained_memory"] += count * sample["retained_memory"]
+        mode["retained_memory"] /= max(mode["sims"], 1)
+        mode["repeats_per_sim"] = (mode["attempts"] - mode["sims"]) / max(mode["sims"], 1)
+        modes[betmode] = mode
+
+    all_samples = [sample for criteria_samples in samples.values() for sample in criteria_samples.values()]
+    peak_memory = max((sample["peak_memory"] for sample in all_samples), default=0)
+    retained_memory = max((mode["retained_memory"] for mode in modes.values()), default=0)
+    total_sims = sum(mode["sims"] for mode in modes.values())
+    cpu_seconds = sum(mode["cpu_seconds"] for mode in modes.values())
+    book_bytes = sum(mode["book_bytes"] for mode in modes.values())
+    disk_bytes = book_bytes + sum(mode["lookup_bytes"] for mode in modes.values())
+    return {
+        "modes": modes,
+        "threads": threads,
+        "sims": total_sims,
+        "cpu_seconds": cpu_seconds,
+        "wall_seconds": cpu_seconds / max(min(threads, num_cpus or os.cpu_count() or 1), 1),
+        "disk_bytes": disk_bytes,
+        "peak_disk_bytes": disk_bytes + book_bytes,
+        "worker_memory": peak_memory + shard_size * retained_memory,
+        "ram_bytes": threads * (peak_memory + shard_size * retained_memory) + total_sims,
+    }
+
+
+def estimate_run(
+    gamestate: object,
+    mode_criteria_counts: Dict[str, Dict[str, int]],
+    threads: int,
+    shard_size: int,
+    compress: bool,
+    sims_per_criteria: int = DRY_RUN_SIMS_PER_CRITERIA,
+) -> dict:
+    """Sample every criteria of the requested modes and project the full run with shards of at most shard_size sims."""
+    preload_gamestate(gamestate)
+    samples = {}
+    for betmode, criteria_counts in mode_criteria_counts.items():
+        samples[betmode] = {}
+        for criteria_index, (criteria, count) in enumerate(criteria_counts.items()):
+            num_sims = max(min(sims_per_criteria, count), 1)
+            print("Sampling", num_sims, "sims of", criteria, "in", betmode, flush=True)
+            samples[betmode][criteria] = sample_criteria(
+                gamestate, betmode, criteria, num_sims, first_sim=criteria_index * sims_per_criteria
+            )
+    estimate = project_run(samples, mode_criteria_counts, threads, shard_size, compress)
+    estimate["samples"] = samples
+    return estimate
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Human readable size."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def format_seconds(seconds: float) -> str:
+    """Human readable duration."""
+    hours, remainder = divmod(int(round(seconds)), 3600)
+    return f"{hours}h {remainder // 60:02d}m {remainder % 60:02d}s"
+
+
+def print_run_estimate(estimate: dict) -> None:
+    """Summarize a projected run."""
+    print("\nDry run estimate for", estimate["sims"], "sims on", estimate["threads"], "threads")
+    for betmode, mode in estimate["modes"].items():
+        print(
+            f"  {betmode}: {mode['sims']} sims, {mode['repeats_per_sim']:.2f} repeats per sim,",
+            f"{format_seconds(mode['cpu_seconds'])} cpu, {format_bytes(mode['book_bytes'])} books",
+        )
+    print("  Wall time:", format_seconds(estimate["wall_seconds"]))
+    print("  Disk:", format_bytes(estimate["disk_bytes"]), "final,", format_bytes(estimate["peak_disk_bytes"]), "peak")
+    print("  RAM:", format_bytes(estimate["ram_bytes"]), f"({format_bytes(estimate['worker_memory'])} per worker)")
@@ -0,0 +1,74 @@
+"""Build read-only simulation data once in the parent process, so forked workers share it copy-on-write."""
+
+from copy import deepcopy
+from typing import Iterator
+
+from src.calculations.statistics import preload_distribution
+
+# configs whose data has been preloaded in this process, keyed by id(config)
+PRELOADED_CONFIGS = {}
+IGNORED_CONFIG_KEYS = ("bet_modes", "reels", "padding_reels")
+
+
+def is_weight_distribution(value) -> bool:
+    """Non-empty {value: weight} dict with numeric weights."""
+    return (
+        isinstance(value, dict)
+        and len(value) > 0
+        and all(isinstance(weight, (int, float)) and not isinstance(weight, bool) for weight in value.values())
+    )
+
+
+def find_weight_distributions(value) -> Iterator[dict]:
+    """All weight distributions nested within dicts, lists and tuples."""
+    if is_weight_distribution(value):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from find_weight_distributions(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from find_weight_distributions(item)
+
+
+def preload_gamestate(gamestate: object) -> None:
+    """
+    Precompute samplers for the weight distributions of every bet mode and config setting, and the positions of
+    special symbols on each reelstrip. Symbol prototypes are built with the gamestate. Repeated calls for the same
+    config are skipped, so workers forked after preloading reuse the parent's data and spawned workers rebuild it.
+    """
+    config = gamestate.config
+    if PRELOADED_CONFIGS.get(id(config)) is config:
+        return
+
+    for betmode in config.bet_modes:
+        for distribution in betmode.get_distributions():
+            for weights in find_weight_distributions(distribution._conditions):
+                preload_distribution(weights)
+    for key, value in vars(config).items():
+        if key not in IGNORED_CONFIG_KEYS:
+            for weights in find_weight_distributions(value):
+                preload_distribution(weights)
+
+    if hasattr(gamestate, "get_syms_on_reel"):
+        for reel_id in config.reels:
+            for special_property in config.special_symbols:
+                gamestate.get_syms_on_reel(reel_id, special_property)
+    PRELOADED_CONFIGS[id(config)] = config
+
+
+def fresh_gamestate(gamestate: object) -> object:
+    """
+    Copy of the pre-simulation gamestate so every sim range starts from identical state.
+    The config, symbol prototypes, reelstrip symbol positions and the resolved bet mode context are read-only and
+    shared.
+    """
+    shared = (
+        gamestate.config,
+        gamestate.symbol_storage,
+        gamestate.reel_symbol_positions,
+        gamestate.current_betmode,
+        gamestate.current_distribution,
+        gamestate.distribution_conditions,
+    )
+    return deepcopy(gamestate, {id(value): value for value in shared})
@@ -0,0 +1,105 @@
+"""Profile simulation workers and combine their results into per-mode reports."""
+
+import os
+import re
+import pstats
+import cProfile
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+MIN_COLLAPSED_FRACTION = 1e-4
+
+
+class ModeProfiler:
+    """One cProfile.Profile per bet mode, so work for several modes in a single process is reported separately."""
+
+    def __init__(self, profile_dir: str, process_name: str):
+        self.profile_dir = profile_dir
+        self.process_name = process_name
+        self.profiles = {}
+
+    def runcall(self, betmode: str, func: Callable, *args, **kwargs):
+        """Call func, attributing its run time to betmode."""
+        if betmode not in self.profiles:
+            self.profiles[betmode] = cProfile.Profile()
+        return self.profiles[betmode].runcall(func, *args, **kwargs)
+
+    def dump(self) -> None:
+        """Write a .prof file for every profiled mode."""
+        for betmode, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.profile_dir, f"{betmode}_{self.process_name}.prof"))
+
+
+def get_frame_label(func: tuple) -> str:
+    """Collapsed-stack frame name from a pstats (file, line, function) key."""
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapse_stats(stats: dict) -> Dict[str, float]:
+    """
+    Approximate collapsed stacks from pstats caller/callee edges.
+    cProfile does not keep full stacks, the time of a function is split between its callees in proportion to
+    the time spent on each call edge. Paths below MIN_COLLAPSED_FRACTION of the total time are dropped.
+    """
+    children = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[2], edge[3]))
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if len(callers) == 0]
+    min_time = sum(stats[root][3] for root in roots) * MIN_COLLAPSED_FRACTION
+    stacks = defaultdict(float)
+
+    def walk(func: tuple, path: tuple, internal_time: float, total_time: float) -> None:
+        path = path + (func,)
+        stacks[";".join(get_frame_label(frame) for frame in path)] += internal_time
+        func_total_time = stats[func][3]
+        if func_total_time <= 0:
+            return
+        scale = total_time / func_total_time
+        for child, edge_internal_time, edge_total_time in children[func]:
+            if child not in path and edge_total_time * scale >= min_time:
+                walk(child, path, edge_internal_time * scale, edge_total_time * scale)
+
+    for root in roots:
+        walk(root, (), stats[root][2], stats[root][3])
+    return stacks
+
+
+def write_collapsed_stacks(stats: pstats.Stats, filename: str) -> None:
+    """Write stacks in 'frame;frame;frame microseconds' format, readable by flamegraph tools."""
+    with open(filename, "w", encoding="UTF-8") as f:
+        for stack, seconds in sorted(collapse_stats(stats.stats).items()):
+            if int(seconds * 1e6) > 0:
+                f.write(f"{stack} {int(seconds * 1e6)}\n")
+
+
+def get_profile_files(profile_dir: str, betmode: str) -> List[str]:
+    """
+    .prof files written for betmode by the main process and the workers. Names are matched exactly, so a mode whose
+    name starts with another mode's name is not included in its report.
+    """
+    profile_name = re.compile(rf"{re.escape(betmode)}_(main|worker\d+)\.prof")
+    profile_files = [fname for fname in os.listdir(profile_dir) if profile_name.fullmatch(fname)]
+    return sorted(os.path.join(profile_dir, fname) for fname in profile_files)
+
+
+def write_profile_reports(profile_dir: str, betmodes: List[str], report_dir: str, num_lines: int = 50) -> None:
+    """Merge per-process profiles of each mode into a .prof file, a text report and collapsed stacks."""
+    os.makedirs(report_dir, exist_ok=True)
+    for betmode in betmodes:
+        profile_files = get_profile_files(profile_dir, betmode)
+        if len(profile_files) == 0:
+            continue
+        report_name = os.path.join(report_dir, f"simulationProfile_{betmode}")
+        stats = pstats.Stats(*profile_files)
+        stats.dump_stats(report_name + ".prof")
+        with open(report_name + ".txt", "w", encoding="UTF-8") as f:
+            report = pstats.Stats(*profile_files, stream=f)
+            f.write(f"Combined profile of {len(profile_files)} processes\n")
+            report.sort_stats("cumulative").print_stats(num_lines)
+            report.sort_stats("tottime").print_stats(num_lines)
+        write_collapsed_stacks(stats, report_name + ".collapsed")
+        print("Profile for", betmode, "written to", report_name + ".txt")
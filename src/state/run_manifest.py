@@ -0,0 +1,90 @@
+"""Track finished simulation shards so interrupted runs can be resumed."""
+
+import os
+import json
+from warnings import warn
+from typing import Dict, List, Tuple, Union
+
+from src.write_data.write_data import get_sha_256
+
+
+def hash_shard_files(filenames: List[str]) -> Dict[str, str]:
+    """sha256 of each shard file, keyed by file name."""
+    return {os.path.basename(fname): get_sha_256(fname) for fname in filenames}
+
+
+def read_run_details(filename: str) -> Union[dict, None]:
+    """Run details recorded in the first line of a manifest, or None if there is no readable manifest."""
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, "r", encoding="UTF-8") as f:
+        try:
+            return json.loads(f.readline())
+        except json.JSONDecodeError:
+            return None
+
+
+class RunManifest:
+    """
+    Append-only record of finished (betmode, shard) tasks, stored as jsonl in the temp directory.
+    The first line describes the run, every following line is a finished shard with the hash of its temp books file,
+    the force keys it recorded and its lookup and force payload. With resume enabled, shards whose files still match
+    their hashes are skipped.
+    """
+
+    def __init__(self, filename: str, run_details: dict, resume: bool = False):
+        self.filename = filename
+        self.run_details = json.loads(json.dumps(run_details))
+        self.finished = {}
+        if resume:
+            self.load()
+
+        self.file = open(self.filename, "w", encoding="UTF-8")
+        self.file.write(json.dumps(self.run_details) + "\n")
+        for (betmode, shard_index), shard_result in self.finished.items():
+            self.file.write(json.dumps({"betmode": betmode, "shard": shard_index, **shard_result}) + "\n")
+        self.file.flush()
+
+    def load(self) -> None:
+        """Read finished shards from a previous run with identical run details."""
+        if not os.path.isfile(self.filename):
+            return
+        with open(self.filename, "r", encoding="UTF-8") as f:
+            lines = f.read().split("\n")
+        try:
+            previous_details = json.loads(lines[0])
+        except json.JSONDecodeError:
+            previous_details = None
+        if previous_details != self.run_details:
+            warn("Run manifest does not match the requested simulations, starting a new run.")
+            return
+
+        temp_path = os.path.dirname(self.filename)
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partially written line from an interrupted run
+            files_match = all(
+                os.path.isfile(os.path.join(temp_path, fname)) and get_sha_256(os.path.join(temp_path, fname)) == sha
+                for fname, sha in entry["files"].items()
+            )
+            if files_match:
+                self.finished[(entry["betmode"], entry["shard"])] = {
+                    key: val for key, val in entry.items() if key not in ("betmode", "shard")
+                }
+
+    def is_finished(self, task: Tuple[str, int]) -> bool:
+        """Shard output exists from an earlier run."""
+        return task in self.finished
+
+    def record(self, task: Tuple[str, int], shard_result: dict) -> None:
+        """Append a finished shard, flushed immediately so it survives a crash."""
+        self.finished[task] = shard_result
+        self.file.write(json.dumps({"betmode": task[0], "shard": task[1], **shard_result}) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        """Close manifest file."""
+        self.file.close()
@@ -1,67 +1,203 @@
+import os
+import gc
 import time
+import math
 import random
-from multiprocessing import Process, Manager
-import cProfile
+import queue
+import traceback
+from multiprocessing import Queue, get_context
 from warnings import warn
 import shutil
-import asyncio
-from typing import Dict
+from typing import Callable, Dict, List, Tuple, Union
 
-from src.write_data.write_data import output_lookup_and_force_files
+from src.state.scheduler import CostOrderedScheduler, partition_sims
+from src.state.run_manifest import RunManifest, hash_shard_files, read_run_details
+from src.state.profiling import ModeProfiler, write_profile_reports
+from src.state.telemetry import ProgressReporter, SimCounters
+from src.state.sim_cache import SimCache, get_mode_fingerprint, get_sources_hash
+from src.state.speculation import Speculation, SpeculationBoard
+from src.state.sim_allocation import SimAllocation
+from src.state.preload import fresh_gamestate, preload_gamestate
+from src.state.dry_run import estimate_run, print_run_estimate
+from src.state.autotune import AUTO, MemoryGuard, tune_run
+from src.state.task_costs import TaskCosts, load_criteria_costs, save_criteria_costs
+from src.calculations.rng import ATTEMPT_SEEDED_MODES
+from src.write_data.write_data import ShardMerger
 
 
 def create_books(
     gamestate: object,
     config: object,
     num_sim_args: dict,
-    batch_size: int,
-    threads: int,
+    batch_size: Union[int, str],
+    threads: Union[int, str],
     compress: bool,
     profiling: bool,
+    resume: bool = False,
+    use_cache: bool = True,
+    report_interval: float = 10.0,
+    metrics_file: str = None,
+    speculate_after: int = None,
+    start_method: str = None,
+    dry_run: bool = False,
 ):
-    """Main run-function for simulating game outcomes and outputting all files."""
+    """
+    Main run-function for simulating game outcomes and outputting all files.
+    Any number of sims can be requested per mode, each mode is split into shards of at most batch_size sims.
+    Shards from all modes are run by a single worker pool, modes are finalized in order as their shards are merged.
+    Finished shards are recorded in a run manifest, with resume=True shards finished by an interrupted run are reused.
+    A resumed run keeps the shards of the interrupted run, so 'auto' batch sizes do not discard its progress.
+    With use_cache=True, modes whose inputs are unchanged since they were last simulated keep their existing outputs.
+    Progress is reported every report_interval seconds, and appended to metrics_file as jsonl if provided.
+    With speculate_after, a sim which has repeated that many times shares its further attempts with idle workers,
+    this requires an attempt seeded config.rng_mode.
+    Workers are started with the multiprocessing start_method ('fork' or 'spawn'), or the platform default.
+    batch_size and threads can be 'auto', they are then chosen from a short sample of every criteria, the cpu count
+    and the available memory, batch sizes are chosen per mode. Workers are retired if memory runs low during the run.
+    With dry_run=True, a small sample of every criteria is simulated instead, and the projected wall time, disk use
+    and RAM of the requested run are printed and returned. No outputs are written.
+    """
+    if speculate_after is not None and config.rng_mode not in ATTEMPT_SEEDED_MODES:
+        raise RuntimeError(f"speculate_after requires an attempt seeded rng_mode {ATTEMPT_SEEDED_MODES}.")
     for key, ns in num_sim_args.items():
-        if all([ns > 0, ns > batch_size * batch_size]):
-            assert (
-                ns % (threads * batch_size) == 0
-            ), "mode-sims/(batch * threads) must be divisible with no remainder"
         num_sim_args[key] = int(ns)
 
+    if dry_run:
+        mode_sims = {betmode_name: num_sims for betmode_name, num_sims in num_sim_args.items() if num_sims > 0}
+        threads, batch_sizes, _ = get_run_settings(gamestate, mode_sims, threads, batch_size)
+        shard_size = max(
+            end - start
+            for betmode_name, num_sims in mode_sims.items()
+            for start, end in get_sim_shards(num_sims, batch_sizes[betmode_name], threads)
+        )
+        mode_criteria_counts = get_mode_criteria_counts(gamestate, mode_sims)
+        estimate = estimate_run(gamestate, mode_criteria_counts, threads, shard_size, compress)
+        print_run_estimate(estimate)
+        return estimate
+
     if not compress and sum(num_sim_args.values()) > 1e4:
         warn("Generating large number of uncompressed books!")
 
-    if profiling and threads > 1:
-        raise RuntimeError("Multithread profiling not supported, threads must = 1 with profiling enabled")
-
     startTime = time.time()
     print("\nCreating books...")
+    output_files = gamestate.output_files
+    sim_cache = SimCache(output_files.get_sim_cache_name())
+    sources_hash = get_sources_hash(config.game_id)
+    fingerprints, mode_sims = {}, {}
     for betmode_name in num_sim_args:
         if num_sim_args[betmode_name] > 0:
-            gamestate.betmode = betmode_name
-            run_multi_process_sims(
-                threads,
-                batch_size,
-                config.game_id,
-                betmode_name,
-                gamestate,
-                num_sims=num_sim_args[betmode_name],
-                compress=compress,
-                write_event_list=config.write_event_list,
-                profiling=profiling,
+            fingerprints[betmode_name] = get_mode_fingerprint(
+                config, betmode_name, num_sim_args[betmode_name], compress, sources_hash
             )
-            output_lookup_and_force_files(
-                threads,
-                batch_size,
-                config.game_id,
+            cached_force_keys = None
+            if use_cache:
+                cached_force_keys = sim_cache.get_cached_force_keys(
+                    betmode_name, fingerprints[betmode_name], output_files.get_final_mode_names(betmode_name, compress)
+                )
+            if cached_force_keys is not None:
+                print("Inputs unchanged for", betmode_name, "reusing previous outputs.")
+                gamestate.combine([cached_force_keys], betmode_name)
+                gamestate.get_betmode(betmode_name).lock_force_keys()
+                continue
+            mode_sims[betmode_name] = num_sim_args[betmode_name]
+
+    if len(mode_sims) > 0:
+        threads, batch_sizes, min_available_memory = get_run_settings(gamestate, mode_sims, threads, batch_size)
+        resumed_shards = get_resumed_shards(output_files.get_run_manifest_name(), mode_sims) if resume else {}
+        mode_plans = {
+            betmode_name: plan_mode_sims(
+                gamestate, betmode_name, num_sims, batch_sizes[betmode_name], threads, resumed_shards.get(betmode_name)
+            )
+            for betmode_name, num_sims in mode_sims.items()
+        }
+        run_mode_sims(
+            gamestate,
+            config,
+            mode_plans,
+            threads,
+            compress,
+            profiling,
+            resume,
+            report_interval,
+            metrics_file,
+            speculate_after,
+            start_method,
+            min_available_memory,
+            fingerprints,
+        )
+        for betmode_name in mode_plans:
+            sim_cache.update(
                 betmode_name,
-                gamestate,
-                num_sims=num_sim_args[betmode_name],
-                compress=compress,
-            )  # , write_event_list=config.write_event_list)
-    shutil.rmtree(gamestate.output_files.temp_path)
+                fingerprints[betmode_name],
+                output_files.get_final_mode_names(betmode_name, compress),
+                gamestate.get_betmode(betmode_name).get_force_keys(),
+            )
+        sim_cache.save()
     print("\nFinished creating books in", time.time() - startTime, "seconds.\n")
 
 
+def get_mode_criteria_counts(gamestate: object, mode_sims: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Number of sims allocated to each criteria of every mode."""
+    return {betmode: get_sim_splits(gamestate, num_sims, betmode) for betmode, num_sims in mode_sims.items()}
+
+
+def get_run_settings(
+    gamestate: object, mode_sims: Dict[str, int], threads: Union[int, str], batch_size: Union[int, str]
+) -> Tuple[int, Dict[str, int], Union[int, None]]:
+    """Threads, batch size of each mode and the available memory below which workers are retired, if any."""
+    if AUTO not in (threads, batch_size):
+        return threads, {betmode: batch_size for betmode in mode_sims}, None
+    return tune_run(gamestate, get_mode_criteria_counts(gamestate, mode_sims), threads, batch_size)
+
+
+def run_mode_sims(
+    gamestate: object,
+    config: object,
+    mode_plans: Dict[str, tuple],
+    threads: int,
+    compress: bool,
+    profiling: bool,
+    resume: bool,
+    report_interval: float = 10.0,
+    metrics_file: str = None,
+    speculate_after: int = None,
+    start_method: str = None,
+    min_available_memory: int = None,
+    fingerprints: Dict[str, str] = None,
+) -> None:
+    """
+    Simulate planned modes, tracking finished shards in a run manifest. Temp files are removed once all outputs are
+    written. fingerprints holds the input fingerprint of each planned mode, a resumed run must match them.
+    """
+    gamestate.output_files.check_folder_exists(gamestate.output_files.temp_path)
+    manifest = RunManifest(
+        gamestate.output_files.get_run_manifest_name(),
+        get_run_details(config, mode_plans, compress, fingerprints or {}),
+        resume=resume,
+    )
+    if resume:
+        print("Resuming run,", len(manifest.finished), "finished shards found.")
+    try:
+        run_multi_process_sims(
+            threads,
+            config.game_id,
+            gamestate,
+            mode_plans,
+            compress=compress,
+            write_event_list=config.write_event_list,
+            profiling=profiling,
+            manifest=manifest,
+            report_interval=report_interval,
+            metrics_file=metrics_file,
+            speculate_after=speculate_after,
+            start_method=start_method,
+            min_available_memory=min_available_memory,
+        )
+    finally:
+        manifest.close()
+    shutil.rmtree(gamestate.output_files.temp_path)
+
+
 def get_sim_splits(gamestate: object, num_sims: int, betmode_name: str) -> Dict[str, int]:
     """Ensure assignment of criteria to all simulations numbers."""
     betmode_distributions = gamestate.get_betmode(betmode_name).get_distributions()
@@ -81,111 +217,438 @@ def get_sim_splits(gamestate: object, num_sims: int, betmode_name: str) -> Dict[
     return num_sims_criteria
 
 
-def assign_sim_criteria(num_sims_criteria: Dict[str, int], sims: int) -> Dict[int, str]:
-    """Assign criteria randomly to simulations based on quota defined in config."""
-    simAllocation = [criteria for criteria, count in num_sims_criteria.items() for _ in range(count)]
+def assign_sim_criteria(num_sims_criteria: Dict[str, int], sims: int) -> SimAllocation:
+    """
+    Assign criteria randomly to simulations based on quota defined in config.
+    Criteria indices are shuffled as bytes, random.shuffle gives the same permutation as for a list of criteria names.
+    """
+    simAllocation = bytearray()
+    for idx, count in enumerate(num_sims_criteria.values()):
+        simAllocation += bytes([idx]) * count
     random.shuffle(simAllocation)
-    return {i: simAllocation[i] for i in range(min(sims, len(simAllocation)))}
-
-
-async def profile_and_visualize(
-    game_id,
-    gamestate,
-    all_betmode_configs,
-    betmode,
-    sim_allocation,
-    threads,
-    num_repeats,
-    sims_per_thread,
-    repeat,
-    compress,
-    write_event_list,
-):
-    """Create flame-graph, automatically opens output on localhost."""
-    output_string = f"games/{game_id}/simulationProfile_{betmode}.prof"
-    cProfile.runctx(
-        "gamestate.run_sims(all_betmode_configs, betmode, sim_allocation, threads, num_repeats, sims_per_thread, 0, repeat, compress, write_event_list)",
-        globals(),
-        locals(),
-        output_string,
+    return SimAllocation(list(num_sims_criteria), simAllocation[:sims])
+
+
+def get_sim_shards(num_sims: int, batching_size: int, num_workers: int = 1) -> List[Tuple[int, int]]:
+    """
+    Split mode simulations into ceil(num_sims / batching_size) balanced shards, which are handed out to workers on
+    demand. A mode with fewer shards than workers is split into one shard per worker, but never below one sim a shard.
+    Books are seeded per sim, so outputs do not depend on the shard boundaries.
+    """
+    num_shards = max(math.ceil(num_sims / batching_size), num_workers)
+    return partition_sims(num_sims, num_shards)
+
+
+def get_resumed_shards(manifest_name: str, mode_sims: Dict[str, int]) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Shards of each mode recorded by an interrupted run, so a resumed run reuses them whichever batch sizes are chosen.
+    Modes whose recorded shards do not cover exactly their requested sims are planned again.
+    """
+    run_details = read_run_details(manifest_name)
+    if not isinstance(run_details, dict):
+        return {}
+    resumed_shards = {}
+    for betmode, num_sims in mode_sims.items():
+        shards = [tuple(shard) for shard in run_details.get("modes", {}).get(betmode, {}).get("shards", [])]
+        starts = [0] + [end for _, end in shards[:-1]]
+        if len(shards) > 0 and shards[-1][1] == num_sims and all(
+            start == expected_start and start < end for (start, end), expected_start in zip(shards, starts)
+        ):
+            resumed_shards[betmode] = shards
+    return resumed_shards
+
+
+def plan_mode_sims(
+    gamestate: object,
+    betmode: str,
+    num_sims: int,
+    batching_size: int,
+    num_workers: int = 1,
+    sim_chunks: List[Tuple[int, int]] = None,
+) -> Tuple[List[Tuple[int, int]], SimAllocation]:
+    """Shard ranges and criteria allocation for all simulations within a mode, sim_chunks are reused if given."""
+    if sim_chunks is None:
+        sim_chunks = get_sim_shards(num_sims, batching_size, num_workers)
+    num_sims_criteria = get_sim_splits(gamestate, num_sims, betmode)
+    return sim_chunks, assign_sim_criteria(num_sims_criteria, num_sims)
+
+
+def get_sim_tasks(mode_plans: Dict[str, tuple]) -> List[Tuple[str, int]]:
+    """All (betmode, shard_index) units of work, ordered by mode and then by shard."""
+    return [
+        (betmode, shard_index)
+        for betmode, (sim_chunks, _) in mode_plans.items()
+        for shard_index in range(len(sim_chunks))
+    ]
+
+
+def get_run_details(config: object, mode_plans: Dict[str, tuple], compress: bool, fingerprints: Dict[str, str]) -> dict:
+    """
+    Description of a run, temp shard files can only be reused by a run with identical details.
+    Each mode's input fingerprint and the rng settings are included, so shards of changed inputs are not reused.
+    """
+    modes = {}
+    for betmode, (sim_chunks, sim_allocation) in mode_plans.items():
+        modes[betmode] = {
+            "shards": sim_chunks,
+            "allocation": sim_allocation.get_digest(),
+            "fingerprint": fingerprints.get(betmode),
+        }
+    return {
+        "game_id": config.game_id,
+        "compress": compress,
+        "write_event_list": config.write_event_list,
+        "rng_mode": config.rng_mode,
+        "rng_seed": config.rng_seed,
+        "modes": modes,
+    }
+
+
+def run_sim_task(
+    gamestate: object,
+    mode_plans: Dict[str, tuple],
+    task: Tuple[str, int],
+    compress: bool,
+    write_event_list: bool,
+    sim_counters: SimCounters = None,
+    speculation: Speculation = None,
+) -> dict:
+    """Simulate one shard of a mode on a fresh gamestate, the betmode is only set on that copy."""
+    betmode, shard_index = task
+    sim_chunks, sim_allocation = mode_plans[betmode]
+    force_keys = []
+    task_gamestate = fresh_gamestate(gamestate)
+    task_gamestate.sim_counters = sim_counters
+    task_gamestate.speculation = speculation
+    shard_payload = task_gamestate.run_sims(
+        betmode_copy_list=force_keys,
+        betmode=betmode,
+        sim_to_criteria=sim_allocation,
+        sim_range=sim_chunks[shard_index],
+        shard_index=shard_index,
+        compress=compress,
+        write_event_list=write_event_list,
     )
-    await asyncio.create_subprocess_exec("snakeviz", output_string)
+    return get_shard_result(gamestate, task, force_keys, shard_payload, compress)
+
+
+def get_shard_result(
+    gamestate: object, task: Tuple[str, int], force_keys: list, shard_payload: dict, compress: bool
+) -> dict:
+    """
+    Force keys and payload of a finished shard, returned to the main process through the result queue.
+    Only books are written to a temp file, its hash lets a resumed run check the file is intact.
+    """
+    books_file = gamestate.output_files.get_temp_multi_thread_name(task[0], task[1], compress)
+    return {"force_keys": force_keys, "files": hash_shard_files([books_file]), **shard_payload}
+
+
+def run_sim_worker(
+    gamestate: object,
+    worker_index: int,
+    mode_plans: Dict[str, tuple],
+    tasks: List[Tuple[str, int]],
+    scheduler: CostOrderedScheduler,
+    compress: bool,
+    write_event_list: bool,
+    result_queue: Queue,
+    profile_dir: str = None,
+    sim_counters: SimCounters = None,
+    speculation_board: SpeculationBoard = None,
+    speculate_after: int = None,
+) -> None:
+    """
+    Long-lived worker, runs (betmode, shard) tasks handed out by the scheduler until none remain.
+    With a profile_dir, each mode's tasks are profiled and written to a .prof file once the worker is done.
+    With a speculation_board, the worker then runs attempts for sims other workers are repeating until all are done.
+    A worker retired by the scheduler exits instead.
+    """
+    preload_gamestate(gamestate)
+    profiler = ModeProfiler(profile_dir, f"worker{worker_index}") if profile_dir is not None else None
+    if sim_counters is not None:
+        sim_counters = sim_counters.for_worker(worker_index)
+    speculation = None
+    if speculation_board is not None:
+        sim_allocations = {betmode: sim_allocation for betmode, (_, sim_allocation) in mode_plans.items()}
+        speculation = Speculation(
+            speculation_board.for_worker(worker_index), fresh_gamestate(gamestate), sim_allocations, speculate_after
+        )
+    while True:
+        task_index = scheduler.next_chunk(worker_index)
+        if task_index is None:
+            break
+        task = tasks[task_index]
+        task_args = (gamestate, mode_plans, task, compress, write_event_list, sim_counters, speculation)
+        try:
+            if profiler is not None:
+                shard_result = profiler.runcall(task[0], run_sim_task, *task_args)
+            else:
+                shard_result = run_sim_task(*task_args)
+        except Exception:
+            result_queue.put((task, None, traceback.format_exc()))
+            break
+        result_queue.put((task, shard_result, None))
+    if speculation is not None and worker_index >= scheduler.get_worker_limit():
+        speculation.retire()
+    elif speculation is not None:
+        speculation.help_until_done()
+    if profiler is not None:
+        profiler.dump()
+
+
+def terminate_workers(processes: list) -> None:
+    """Stop every worker which is still running."""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def collect_worker_results(
+    processes: list,
+    result_queue: Queue,
+    num_results: int,
+    on_result: Callable = None,
+    poll_interval: float = 1.0,
+    on_poll: Callable = None,
+) -> list:
+    """
+    Gather results from the pool as they arrive, raising if a worker fails or exits unexpectedly.
+    Exit codes are checked before waiting for each result, remaining workers are stopped before raising.
+    on_poll is called before waiting for each result.
+    """
+    results = []
+    while len(results) < num_results:
+        if on_poll is not None:
+            on_poll()
+        for process in processes:
+            if process.exitcode not in (None, 0):
+                terminate_workers(processes)
+                raise RuntimeError(f"Worker {process.name} exited with code {process.exitcode}.")
+        try:
+            result = result_queue.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+        if result[2] is not None:
+            terminate_workers(processes)
+            raise RuntimeError(f"Worker failed on task {result[0]}:\n{result[2]}")
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results
 
 
 def run_multi_process_sims(
     threads: int,
-    batching_size: int,
     game_id: str,
-    betmode: str,
     gamestate: object,
-    num_sims: int = 1000000,
+    mode_plans: Dict[str, tuple],
     compress: bool = True,
     write_event_list: bool = False,
     profiling: bool = False,
-):
-    """Setup multiprocessing manager for running all game-mode simulations."""
-    print("\nCreating books for", game_id, "in", betmode)
-    num_repeats = max(int(round(num_sims / threads / batching_size, 0)), 1)
-    sims_per_thread = int(num_sims / threads / num_repeats)
-    num_sims_criteria = get_sim_splits(gamestate, num_sims, betmode)
-    sim_allocation = assign_sim_criteria(num_sims_criteria, num_sims)
-    for repeat in range(num_repeats):
-        print("Batch", repeat + 1, "of", num_repeats)
-        processes = []
-        manager = Manager()
-        all_betmode_configs = manager.list()
-        if profiling:
-            asyncio.run(
-                profile_and_visualize(
-                    game_id=game_id,
-                    gamestate=gamestate,
-                    all_betmode_configs=all_betmode_configs,
-                    betmode=betmode,
-                    sim_allocation=sim_allocation,
-                    threads=threads,
-                    num_repeats=num_repeats,
-                    sims_per_thread=sims_per_thread,
-                    repeat=repeat,
-                    compress=compress,
-                    write_event_list=write_event_list,
-                )
-            )
-        elif threads == 1:
-            gamestate.run_sims(
-                betmode_copy_list=all_betmode_configs,
-                betmode=betmode,
-                sim_to_criteria=sim_allocation,
-                total_threads=threads,
-                total_repeats=num_repeats,
-                num_sims=sims_per_thread,
-                thread_index=0,
-                repeat_count=repeat,
-                compress=compress,
-                write_event_list=write_event_list,
-            )
+    manifest: RunManifest = None,
+    report_interval: float = 10.0,
+    metrics_file: str = None,
+    speculate_after: int = None,
+    start_method: str = None,
+    min_available_memory: int = None,
+) -> None:
+    """
+    Setup a persistent worker pool running the shards of every requested mode.
+    Finished shards are routed to their mode's merger while the pool is running, a mode is finalized once all of its
+    shards are merged. Its force options are added to force.json once all earlier modes are finalized, so modes are
+    listed in a fixed order. Shards already finished in the manifest are not re-run.
+    Modes are run most expensive first, using criteria costs measured by previous runs and during this run, and the
+    shards of each mode in shard order.
+    """
+    all_tasks = get_sim_tasks(mode_plans)
+    tasks = [task for task in all_tasks if manifest is None or not manifest.is_finished(task)]
+    mergers = {
+        betmode: ShardMerger(
+            game_id, betmode, gamestate.output_files, len(sim_chunks), compress, write_event_list=write_event_list
+        )
+        for betmode, (sim_chunks, _) in mode_plans.items()
+    }
+    mode_force_keys = {betmode: [] for betmode in mode_plans}
+    unlisted_modes = list(mode_plans)
+
+    def merge_result(result: tuple) -> None:
+        task, shard_result, _ = result
+        if manifest is not None and not manifest.is_finished(task):
+            manifest.record(task, shard_result)
+        betmode, shard_index = task
+        mode_force_keys[betmode].append(shard_result["force_keys"])
+        mergers[betmode].add_shard(shard_index, shard_result)
+        if mergers[betmode].is_complete():
+            mergers[betmode].finalize(write_force_options=False)
+        # force.json lists modes in a fixed order
+        while len(unlisted_modes) > 0 and mergers[unlisted_modes[0]].is_finalized:
+            mergers[unlisted_modes.pop(0)].write_force_options()
+
+    for betmode, (sim_chunks, _) in mode_plans.items():
+        print("Creating books for", game_id, "in", betmode, "with", len(sim_chunks), "shards")
+    finished_results = [(task, manifest.finished[task], None) for task in all_tasks if task not in tasks]
+    profile_dir = None
+    if profiling:
+        profile_dir = os.path.join(gamestate.output_files.temp_path, "profiles")
+        gamestate.output_files.check_folder_exists(profile_dir)
+    mode_criteria = [
+        (betmode, criteria)
+        for betmode, (_, sim_allocation) in mode_plans.items()
+        for criteria in sorted(sim_allocation.get_used_criteria())
+    ]
+    sim_counters = SimCounters(threads, mode_criteria)
+    num_task_sims = 0
+    for betmode, shard_index in tasks:
+        start, end = mode_plans[betmode][0][shard_index]
+        num_task_sims += end - start
+    criteria_costs_name = gamestate.output_files.get_criteria_costs_name()
+    task_costs = TaskCosts(tasks, mode_plans, load_criteria_costs(criteria_costs_name))
+    reporter = ProgressReporter(sim_counters, num_task_sims, interval=report_interval, metrics_file=metrics_file)
+    try:
+        run_sim_pool(
+            threads,
+            game_id,
+            gamestate,
+            mode_plans,
+            tasks,
+            on_result=merge_result,
+            finished_results=finished_results,
+            compress=compress,
+            write_event_list=write_event_list,
+            profile_dir=profile_dir,
+            sim_counters=sim_counters,
+            speculate_after=speculate_after,
+            start_method=start_method,
+            min_available_memory=min_available_memory,
+            task_costs=task_costs,
+            reporter=reporter,
+        )
+    finally:
+        reporter.stop()
+    save_criteria_costs(criteria_costs_name, sim_counters.get_criteria_seconds())
+    if profiling:
+        write_profile_reports(profile_dir, list(mode_plans), gamestate.output_files.profile_path)
+
+    for betmode, force_keys in mode_force_keys.items():
+        gamestate.combine(force_keys, betmode)
+        gamestate.get_betmode(betmode).lock_force_keys()
+
+
+def run_sim_pool(
+    threads: int,
+    game_id: str,
+    gamestate: object,
+    mode_plans: Dict[str, tuple],
+    tasks: List[Tuple[str, int]],
+    on_result: Callable,
+    finished_results: list = (),
+    compress: bool = True,
+    write_event_list: bool = False,
+    profile_dir: str = None,
+    sim_counters: SimCounters = None,
+    speculate_after: int = None,
+    start_method: str = None,
+    min_available_memory: int = None,
+    task_costs: TaskCosts = None,
+    reporter: ProgressReporter = None,
+) -> None:
+    """
+    Run (betmode, shard) tasks on a persistent worker pool, or serially using a single thread.
+    on_result is called in the main process for each finished_result and then for each task as it finishes.
+    With a profile_dir, every worker and the main process write per-mode .prof files to it.
+    Workers publish progress through sim_counters when provided, a reporter is started once all workers are started,
+    so no reporting thread is running while workers are forked.
+    With speculate_after, workers without shards left run attempts of sims repeated at least that many times.
+    With min_available_memory, workers are retired one at a time while less memory than that is available.
+    With task_costs, workers take tasks of the most expensive mode first, the remaining tasks are reordered as
+    criteria costs are measured through sim_counters. Otherwise tasks are run in order.
+    Read-only game data is preloaded before starting workers. Forked workers share it copy-on-write, and the parent's
+    objects are frozen out of garbage collection so collections in workers do not copy their pages.
+    If handling a result fails, workers are terminated before the error is raised, as nothing drains their results.
+    """
+    preload_gamestate(gamestate)
+    main_profiler = ModeProfiler(profile_dir, "main") if profile_dir is not None else None
+
+    def handle_result(result: tuple) -> None:
+        if main_profiler is not None:
+            main_profiler.runcall(result[0][0], on_result, result)
         else:
-            for thread in range(threads):
-                process = Process(
-                    target=gamestate.run_sims,
-                    args=(
-                        all_betmode_configs,
-                        betmode,
-                        sim_allocation,
-                        threads,
-                        num_repeats,
-                        sims_per_thread,
-                        thread,
-                        repeat,
-                        compress,
-                        write_event_list,
-                    ),
+            on_result(result)
+
+    if threads == 1:
+        if reporter is not None:
+            reporter.start()
+        for result in finished_results:
+            handle_result(result)
+        for task_index, task in enumerate(tasks):
+            print("Batch", task_index + 1, "of", len(tasks))
+            worker_counters = sim_counters.for_worker(0) if sim_counters is not None else None
+            if main_profiler is not None:
+                shard_result = main_profiler.runcall(
+                    task[0], run_sim_task, gamestate, mode_plans, task, compress, write_event_list, worker_counters
                 )
-                print("Started thread", thread)
-                process.start()
-                processes += [process]
-            print("All threads are online.")
-            for process in processes:
-                process.join()
-            print("Finished joining threads.")
-            gamestate.combine(all_betmode_configs, betmode)
-            gamestate.get_betmode(betmode).lock_force_keys()
+            else:
+                shard_result = run_sim_task(gamestate, mode_plans, task, compress, write_event_list, worker_counters)
+            handle_result((task, shard_result, None))
+        if main_profiler is not None:
+            main_profiler.dump()
+        return
+
+    context = get_context(start_method)
+    costs = task_costs.get_mode_priorities() if task_costs is not None else None
+    scheduler = CostOrderedScheduler(len(tasks), threads, costs=costs, context=context)
+    speculation_board = None
+    if speculate_after is not None:
+        speculation_board = SpeculationBoard(threads, list(mode_plans), context=context)
+    result_queue = context.Queue()
+    if context.get_start_method() == "fork":
+        gc.collect()
+        gc.freeze()
+    processes = []
+    for thread in range(threads):
+        process = context.Process(
+            target=run_sim_worker,
+            args=(
+                gamestate,
+                thread,
+                mode_plans,
+                tasks,
+                scheduler,
+                compress,
+                write_event_list,
+                result_queue,
+                profile_dir,
+                sim_counters,
+                speculation_board,
+                speculate_after,
+            ),
+        )
+        print("Started thread", thread)
+        process.start()
+        processes += [process]
+    print("All threads are online.")
+
+    try:
+        if reporter is not None:
+            reporter.start()
+        for result in finished_results:
+            handle_result(result)
+        memory_guard = MemoryGuard(scheduler, min_available_memory) if min_available_memory is not None else None
+
+        def poll_pool() -> None:
+            if memory_guard is not None:
+                memory_guard.check()
+            if task_costs is not None and sim_counters is not None:
+                task_costs.reorder(scheduler, sim_counters)
+
+        collect_worker_results(processes, result_queue, len(tasks), on_result=handle_result, on_poll=poll_pool)
+    except BaseException:
+        terminate_workers(processes)
+        raise
+    finally:
+        for process in processes:
+            process.join()
+        gc.unfreeze()
+    print("Finished joining threads.")
+    if main_profiler is not None:
+        main_profiler.dump()
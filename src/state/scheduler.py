@@ -0,0 +1,76 @@
+"""Distribute simulation chunks across worker processes."""
+
+import multiprocessing
+from typing import Iterable, List, Tuple, Union
+
+
+def partition_sims(num_sims: int, num_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split simulations [0, num_sims) into contiguous (start, end) shards.
+    Shard sizes differ by at most one, the remainder is spread over the leading shards.
+    """
+    assert num_sims >= 0 and num_shards > 0, "num_sims must be >= 0 and num_shards > 0"
+    num_shards = min(num_shards, max(num_sims, 1))
+    base_size, remainder = divmod(num_sims, num_shards)
+    shards, start = [], 0
+    for shard in range(num_shards):
+        end = start + base_size + (shard < remainder)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+class CostOrderedScheduler:
+    """
+    Hands out chunk indices to workers on demand, the most expensive remaining chunk first.
+    Chunks of equal cost are handed out in index order, so without cost estimates shards are run in mode and shard
+    order. The order of chunks not yet handed out can be updated as costs are learned during the run.
+    Chunk indices map to fixed simulation ranges, so book ids do not depend on which worker ran a chunk.
+    Workers at or above the worker limit are handed no further chunks.
+    """
+
+    def __init__(self, num_chunks: int, num_workers: int, costs: List[float] = None, context: object = None):
+        self.num_chunks = num_chunks
+        self.num_workers = num_workers
+        context = context if context is not None else multiprocessing.get_context()
+        # chunk order, followed by the number of chunks handed out and the worker limit
+        self.order = context.Array("q", num_chunks + 2)
+        self.next_index = num_chunks
+        self.limit_index = num_chunks + 1
+        order = get_cost_order(range(num_chunks), costs) if costs is not None else range(num_chunks)
+        for position, chunk in enumerate(order):
+            self.order[position] = chunk
+        self.order[self.limit_index] = num_workers
+
+    def get_worker_limit(self) -> int:
+        """Number of workers still handed chunks."""
+        return self.order[self.limit_index]
+
+    def limit_workers(self, num_workers: int) -> None:
+        """Stop handing chunks to workers with index num_workers or above, at least one worker is kept."""
+        with self.order.get_lock():
+            self.order[self.limit_index] = max(min(num_workers, self.get_worker_limit()), 1)
+
+    def remaining(self) -> int:
+        """Number of chunks not yet handed out."""
+        return self.num_chunks - self.order[self.next_index]
+
+    def next_chunk(self, worker_index: int) -> Union[int, None]:
+        """Return the next chunk index for a worker, or None once all chunks have been handed out or it is retired."""
+        with self.order.get_lock():
+            if worker_index >= self.get_worker_limit() or self.remaining() == 0:
+                return None
+            chunk = self.order[self.order[self.next_index]]
+            self.order[self.next_index] += 1
+            return chunk
+
+    def reorder(self, costs: List[float]) -> None:
+        """Order the chunks not yet handed out by their updated costs."""
+        with self.order.get_lock():
+            start = self.order[self.next_index]
+            self.order[start : self.num_chunks] = get_cost_order(self.order[start : self.num_chunks], costs)
+
+
+def get_cost_order(chunks: Iterable[int], costs: List[float]) -> List[int]:
+    """Chunks by decreasing cost, chunks of equal cost in index order."""
+    return sorted(chunks, key=lambda chunk: (-costs[chunk], chunk))
@@ -0,0 +1,47 @@
+"""Compact criteria allocation shared by all worker processes."""
+
+import json
+import hashlib
+import ctypes
+from multiprocessing.sharedctypes import RawArray
+from typing import List
+
+import numpy as np
+
+MAX_CRITERIA = 256
+
+
+class SimAllocation:
+    """
+    Criteria of every simulation in a mode, stored as one criteria index byte per sim.
+    The indices live in shared memory, so forked workers read the same allocation without copying it.
+    """
+
+    def __init__(self, criteria: List[str], indices: bytearray):
+        assert len(criteria) <= MAX_CRITERIA, f"at most {MAX_CRITERIA} criteria can be allocated per mode"
+        self.criteria = list(criteria)
+        self.indices = RawArray("B", len(indices))
+        ctypes.memmove(self.indices, bytes(indices), len(indices))
+
+    def __getitem__(self, sim: int) -> str:
+        return self.criteria[self.indices[sim]]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def get_criteria_counts(self, start: int, end: int) -> List[int]:
+        """Number of sims [start, end) allocated to each criteria, in criteria order."""
+        indices = np.frombuffer(self.indices, dtype=np.uint8)[start:end]
+        return np.bincount(indices, minlength=len(self.criteria)).tolist()
+
+    def get_used_criteria(self) -> List[str]:
+        """Criteria assigned to at least one simulation, counted in place on the shared indices."""
+        counts = np.bincount(np.frombuffer(self.indices, dtype=np.uint8), minlength=len(self.criteria))
+        used = np.flatnonzero(counts)
+        return [self.criteria[idx] for idx in used.tolist()]
+
+    def get_digest(self) -> str:
+        """sha256 of the criteria names and the criteria of every simulation."""
+        digest = hashlib.sha256(json.dumps(self.criteria).encode("UTF-8"))
+        digest.update(bytes(self.indices))
+        return digest.hexdigest()
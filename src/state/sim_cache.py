@@ -0,0 +1,130 @@
+"""Fingerprint simulation inputs so unchanged bet modes are not re-simulated."""
+
+import os
+import sys
+import json
+import hashlib
+from typing import List
+
+from src.config.paths import PATH_TO_GAMES, PROJECT_PATH
+from src.write_data.write_data import get_sha_256
+
+IGNORED_SOURCE_FILES = ("run.py", "game_optimization.py")
+
+
+def describe_value(value):
+    """
+    JSON-ready description of a config value. Sets are sorted so the description does not depend on hash seeds,
+    paths are relative to the project so fingerprints match between checkouts.
+    """
+    if isinstance(value, str) and value.startswith(PROJECT_PATH):
+        return os.path.relpath(value, PROJECT_PATH)
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return [[describe_value(key), describe_value(val)] for key, val in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [describe_value(val) for val in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(json.dumps(describe_value(val)) for val in value)
+    if hasattr(value, "__dict__"):
+        return {type(value).__name__: describe_value(vars(value))}
+    return repr(value)
+
+
+def get_source_files(game_id: str) -> List[str]:
+    """Python sources of the game and of the engine, excluding run and optimization setup files."""
+    source_files = []
+    for folder in (os.path.join(PATH_TO_GAMES, game_id), os.path.join(PROJECT_PATH, "src")):
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = sorted(d for d in dirs if d not in ("library", "__pycache__"))
+            source_files += [
+                os.path.join(root, f) for f in sorted(files) if f.endswith(".py") and f not in IGNORED_SOURCE_FILES
+            ]
+    return source_files
+
+
+def get_sources_hash(game_id: str) -> str:
+    """Single hash of all source files used to run the simulations."""
+    sources = hashlib.sha256()
+    for fname in get_source_files(game_id):
+        sources.update(os.path.relpath(fname, PROJECT_PATH).encode("UTF-8"))
+        sources.update(get_sha_256(fname).encode("UTF-8"))
+    return sources.hexdigest()
+
+
+def get_mode_reels(betmode: object) -> List[str]:
+    """Names of all reelstrips referenced by a mode's distributions."""
+    reel_names = set()
+    for distribution in betmode.get_distributions():
+        for reel_weights in distribution._conditions.get("reel_weights", {}).values():
+            reel_names.update(reel_weights.keys())
+    return sorted(reel_names)
+
+
+def get_mode_fingerprint(
+    config: object,
+    betmode_name: str,
+    num_sims: int,
+    compress: bool,
+    sources_hash: str,
+) -> str:
+    """
+    Hash of everything a mode's outputs depend on: the mode and its distributions, the reelstrips it references,
+    all other game config settings, the game and engine sources and the number of simulations.
+    """
+    betmode = next(bm for bm in config.bet_modes if bm.get_name() == betmode_name)
+    mode_details = {key: val for key, val in vars(betmode).items() if key != "_force_keys"}
+    config_details = {key: val for key, val in vars(config).items() if key not in ("bet_modes", "reels")}
+    fingerprint = {
+        "python": list(sys.version_info[:2]),
+        "num_sims": num_sims,
+        "compress": compress,
+        "betmode": describe_value(mode_details),
+        "reels": {name: config.reels[name] for name in get_mode_reels(betmode)},
+        "config": describe_value(config_details),
+        "sources": sources_hash,
+    }
+    return hashlib.sha256(json.dumps(fingerprint).encode("UTF-8")).hexdigest()
+
+
+class SimCache:
+    """
+    Record of the input fingerprint and output file hashes for each simulated mode.
+    A mode can be reused if its fingerprint matches and its outputs have not been modified since.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.modes = {}
+        if os.path.isfile(filename):
+            with open(filename, "r", encoding="UTF-8") as f:
+                try:
+                    self.modes = json.load(f)
+                except json.JSONDecodeError:
+                    self.modes = {}
+
+    def get_cached_force_keys(self, betmode: str, fingerprint: str, output_files: List[str]) -> List[str]:
+        """Force keys of a reusable mode, or None if the mode must be simulated."""
+        entry = self.modes.get(betmode)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        if sorted(entry["files"]) != sorted(os.path.basename(fname) for fname in output_files):
+            return None
+        for fname in output_files:
+            if not os.path.isfile(fname) or get_sha_256(fname) != entry["files"][os.path.basename(fname)]:
+                return None
+        return entry["force_keys"]
+
+    def update(self, betmode: str, fingerprint: str, output_files: List[str], force_keys: List[str]) -> None:
+        """Record outputs of a newly simulated mode."""
+        self.modes[betmode] = {
+            "fingerprint": fingerprint,
+            "files": {os.path.basename(fname): get_sha_256(fname) for fname in output_files},
+            "force_keys": list(force_keys),
+        }
+
+    def save(self) -> None:
+        """Write cache record."""
+        with open(self.filename, "w", encoding="UTF-8") as f:
+            f.write(json.dumps(self.modes, indent=4))
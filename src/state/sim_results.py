@@ -0,0 +1,102 @@
+"""Columnar per-simulation results of a shard, kept apart from the streamed books."""
+
+from array import array
+from typing import List, Union
+
+import numpy as np
+
+# flags of sims whose basegame or freegame win is an int, which lookup rows print without a decimal point
+INT_BASE_WIN = 1
+INT_FREE_WIN = 2
+
+
+class SimResults:
+    """
+    Book id, payout in cents, basegame and freegame wins, criteria index and repeated attempts of every finished sim,
+    each held in a typed array. Lookup and pay split rows are formatted a column at a time, in book id order.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.payouts = array("q")
+        self.base_wins = array("d")
+        self.free_wins = array("d")
+        self.criteria_indices = array("H")
+        self.repeats = array("I")
+        self.int_wins = array("B")
+        self.criteria = []
+        self.criteria_ids = {}
+
+    def add(self, book_id: int, payout: int, base_win: float, free_win: float, criteria: str, repeats: int) -> None:
+        """Record a finished sim."""
+        criteria_index = self.criteria_ids.get(criteria)
+        if criteria_index is None:
+            criteria_index = self.criteria_ids[criteria] = len(self.criteria)
+            self.criteria.append(criteria)
+        self.ids.append(book_id)
+        self.payouts.append(payout)
+        self.base_wins.append(base_win)
+        self.free_wins.append(free_win)
+        self.criteria_indices.append(criteria_index)
+        self.repeats.append(repeats)
+        int_wins = INT_BASE_WIN if isinstance(base_win, int) else 0
+        if isinstance(free_win, int):
+            int_wins |= INT_FREE_WIN
+        self.int_wins.append(int_wins)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_order(self) -> Union[np.ndarray, None]:
+        """
+        Rows in book id order, or None if rows were added in that order. A sim recorded more than once keeps its
+        last row, as a library keyed by book id would.
+        """
+        ids = np.frombuffer(self.ids, dtype=np.int64)
+        if np.all(ids[1:] > ids[:-1]):
+            return None
+        _, last_reversed = np.unique(ids[::-1], return_index=True)
+        return len(ids) - 1 - last_reversed
+
+    def get_column(self, column: array, order: Union[np.ndarray, None]) -> np.ndarray:
+        """Column values in book id order."""
+        values = np.frombuffer(column, dtype=column.typecode)
+        return values if order is None else values.take(order)
+
+    def get_wins(self, column: array, int_flag: int, order: Union[np.ndarray, None]) -> List[Union[int, float]]:
+        """
+        Win column rounded to cents as lookup rows print it, wins recorded as ints are restored to ints.
+        Wins are usually rounded to cents already and round(win, 2) returns them unchanged, so only others are rounded.
+        """
+        values = self.get_column(column, order)
+        wins = values.tolist()
+        for row in np.flatnonzero(np.rint(values * 100) / 100 != values).tolist():
+            wins[row] = round(wins[row], 2)
+        for row in np.flatnonzero(self.get_column(self.int_wins, order) & int_flag).tolist():
+            wins[row] = int(wins[row])
+        return wins
+
+    def get_lookup_rows(self) -> str:
+        """Lookup table rows: book id, weight 1 and payout in cents."""
+        order = self.get_order()
+        return "".join(
+            map(
+                "{},1,{}\n".format,
+                self.get_column(self.ids, order).tolist(),
+                self.get_column(self.payouts, order).tolist(),
+            )
+        )
+
+    def get_pay_split_rows(self) -> str:
+        """Pay split rows: book id, criteria, basegame and freegame wins."""
+        order = self.get_order()
+        criteria = np.array(self.criteria, dtype=object)
+        return "".join(
+            map(
+                "{},{},{},{}\n".format,
+                self.get_column(self.ids, order).tolist(),
+                criteria[self.get_column(self.criteria_indices, order)].tolist(),
+                self.get_wins(self.base_wins, INT_BASE_WIN, order),
+                self.get_wins(self.free_wins, INT_FREE_WIN, order),
+            )
+        )
@@ -0,0 +1,231 @@
+"""Run repeated attempts of an expensive simulation on idle workers, keeping the sequential result."""
+
+import copy
+import time
+import multiprocessing
+from typing import Dict, List, Tuple, Union
+
+from src.wins.win_manager import WinManager
+from src.state.sim_allocation import SimAllocation
+from src.state.sim_results import SimResults
+
+NO_SUCCESS = 2**62
+POLL_INTERVAL = 0.002
+# shared fields of each worker's slot, describing the sim it is speculating on
+ACTIVE, EPISODE, MODE, SIM, NEXT_ATTEMPT, BEST_ATTEMPT = range(6)
+SLOT_SIZE = 6
+# shared fields of each worker's in-flight attempt
+FLIGHT_SLOT, FLIGHT_EPISODE, FLIGHT_ATTEMPT = range(3)
+FLIGHT_SIZE = 3
+
+
+class NoAttemptsLeft(Exception):
+    """Raised from reset_book once every attempt a claimant could run is no longer needed."""
+
+
+class SpeculationBoard:
+    """
+    Shared memory through which workers publish sims stuck repeating attempts and claim attempts to run for them.
+    Attempt indices of a sim are claimed in increasing order. A sim is resolved once some attempt succeeded and no
+    lower attempt is still running, the lowest successful attempt is the one a sequential run would have accepted.
+    Each worker owns one slot, episodes tell apart successive sims posted to the same slot.
+    """
+
+    def __init__(self, num_workers: int, betmodes: List[str], context: object = None):
+        self.num_workers = num_workers
+        self.betmodes = list(betmodes)
+        self.flight_offset = num_workers * SLOT_SIZE
+        self.busy_offset = self.flight_offset + num_workers * FLIGHT_SIZE
+        context = context if context is not None else multiprocessing.get_context()
+        self.values = context.Array("q", self.busy_offset + 1)
+        for worker in range(num_workers):
+            self.values[self.flight_offset + worker * FLIGHT_SIZE + FLIGHT_SLOT] = -1
+        self.values[self.busy_offset] = num_workers
+        self.worker_index = None
+
+    def for_worker(self, worker_index: int) -> "SpeculationBoard":
+        """View of the board which posts to and claims attempts as a single worker."""
+        worker_board = copy.copy(self)
+        worker_board.worker_index = worker_index
+        return worker_board
+
+    def slot_field(self, slot: int, field: int) -> int:
+        """Index of a slot field in the shared array."""
+        return slot * SLOT_SIZE + field
+
+    def flight_field(self, worker: int, field: int) -> int:
+        """Index of a worker's in-flight attempt field in the shared array."""
+        return self.flight_offset + worker * FLIGHT_SIZE + field
+
+    def post(self, betmode: str, sim: int, first_attempt: int) -> int:
+        """Publish a sim to this worker's slot, attempts are claimed from first_attempt. Returns the episode."""
+        slot = self.worker_index
+        with self.values.get_lock():
+            self.values[self.slot_field(slot, EPISODE)] += 1
+            self.values[self.slot_field(slot, MODE)] = self.betmodes.index(betmode)
+            self.values[self.slot_field(slot, SIM)] = sim
+            self.values[self.slot_field(slot, NEXT_ATTEMPT)] = first_attempt
+            self.values[self.slot_field(slot, BEST_ATTEMPT)] = NO_SUCCESS
+            self.values[self.slot_field(slot, ACTIVE)] = 1
+            return self.values[self.slot_field(slot, EPISODE)]
+
+    def close(self, slot: int) -> int:
+        """Stop speculating on a slot's sim, returning its lowest successful attempt."""
+        with self.values.get_lock():
+            self.values[self.slot_field(slot, ACTIVE)] = 0
+            return self.values[self.slot_field(slot, BEST_ATTEMPT)]
+
+    def claim(self, slot: int, episode: int) -> Union[int, None]:
+        """
+        Next attempt to run for a slot's sim, or None if no further attempts can lower its result.
+        Any attempt this worker was running has failed, since it is asking for another one.
+        """
+        with self.values.get_lock():
+            self.values[self.flight_field(self.worker_index, FLIGHT_SLOT)] = -1
+            if (
+                self.values[self.slot_field(slot, ACTIVE)] == 0
+                or self.values[self.slot_field(slot, EPISODE)] != episode
+                or self.values[self.slot_field(slot, NEXT_ATTEMPT)] >= self.values[self.slot_field(slot, BEST_ATTEMPT)]
+            ):
+                return None
+            attempt = self.values[self.slot_field(slot, NEXT_ATTEMPT)]
+            self.values[self.slot_field(slot, NEXT_ATTEMPT)] += 1
+            self.values[self.flight_field(self.worker_index, FLIGHT_SLOT)] = slot
+            self.values[self.flight_field(self.worker_index, FLIGHT_EPISODE)] = episode
+            self.values[self.flight_field(self.worker_index, FLIGHT_ATTEMPT)] = attempt
+            return attempt
+
+    def report_success(self) -> None:
+        """The attempt this worker was running was accepted."""
+        with self.values.get_lock():
+            slot = self.values[self.flight_field(self.worker_index, FLIGHT_SLOT)]
+            episode = self.values[self.flight_field(self.worker_index, FLIGHT_EPISODE)]
+            attempt = self.values[self.flight_field(self.worker_index, FLIGHT_ATTEMPT)]
+            if slot >= 0 and self.values[self.slot_field(slot, EPISODE)] == episode:
+                best = self.slot_field(slot, BEST_ATTEMPT)
+                self.values[best] = min(self.values[best], attempt)
+            self.values[self.flight_field(self.worker_index, FLIGHT_SLOT)] = -1
+
+    def release(self) -> None:
+        """Clear this worker's in-flight attempt without reporting a result."""
+        with self.values.get_lock():
+            self.values[self.flight_field(self.worker_index, FLIGHT_SLOT)] = -1
+
+    def is_resolved(self, slot: int, episode: int) -> bool:
+        """An attempt succeeded and every lower attempt has finished."""
+        with self.values.get_lock():
+            best = self.values[self.slot_field(slot, BEST_ATTEMPT)]
+            if best == NO_SUCCESS:
+                return False
+            return not any(
+                self.values[self.flight_field(worker, FLIGHT_SLOT)] == slot
+                and self.values[self.flight_field(worker, FLIGHT_EPISODE)] == episode
+                and self.values[self.flight_field(worker, FLIGHT_ATTEMPT)] < best
+                for worker in range(self.num_workers)
+            )
+
+    def find_open_slot(self) -> Union[Tuple[int, int, str, int], None]:
+        """(slot, episode, betmode, sim) of a posted sim which still needs attempts, if any."""
+        with self.values.get_lock():
+            for slot in range(self.num_workers):
+                if (
+                    self.values[self.slot_field(slot, ACTIVE)] == 1
+                    and self.values[self.slot_field(slot, NEXT_ATTEMPT)]
+                    < self.values[self.slot_field(slot, BEST_ATTEMPT)]
+                ):
+                    return (
+                        slot,
+                        self.values[self.slot_field(slot, EPISODE)],
+                        self.betmodes[self.values[self.slot_field(slot, MODE)]],
+                        self.values[self.slot_field(slot, SIM)],
+                    )
+        return None
+
+    def worker_done(self) -> None:
+        """This worker has no shards left to run."""
+        with self.values.get_lock():
+            self.values[self.busy_offset] -= 1
+
+    def has_busy_workers(self) -> bool:
+        """Some worker is still running shards."""
+        return self.values[self.busy_offset] > 0
+
+
+class AttemptClaims:
+    """Hands a gamestate the attempt indices it should run for a posted sim."""
+
+    def __init__(self, board: SpeculationBoard, slot: int, episode: int):
+        self.board = board
+        self.slot = slot
+        self.episode = episode
+
+    def claim(self) -> int:
+        """Next attempt index, raises NoAttemptsLeft once no more attempts are needed."""
+        attempt = self.board.claim(self.slot, self.episode)
+        if attempt is None:
+            raise NoAttemptsLeft()
+        return attempt
+
+
+class Speculation:
+    """
+    A worker's access to speculative attempts. Once a sim has repeated speculate_after times, its remaining attempts
+    are shared with idle workers and the sim continues from the lowest successful attempt.
+    Attempts are run on attempt_state, a copy of the pre-simulation gamestate, so the owning shard is unchanged.
+    """
+
+    def __init__(
+        self,
+        board: SpeculationBoard,
+        attempt_state: object,
+        sim_allocations: Dict[str, SimAllocation],
+        speculate_after: int,
+    ):
+        self.board = board
+        self.attempt_state = attempt_state
+        self.sim_allocations = sim_allocations
+        self.speculate_after = speculate_after
+
+    def run_attempts(self, slot: int, episode: int, betmode: str, sim: int) -> None:
+        """Run claimed attempts of a posted sim until one succeeds or no more are needed."""
+        attempt_state = self.attempt_state
+        mode_max_win = attempt_state.get_betmode(betmode).get_wincap()
+        attempt_state.win_manager = WinManager(
+            attempt_state.config.basegame_type, attempt_state.config.freegame_type, mode_max_win
+        )
+        attempt_state.betmode = betmode
+        attempt_state.criteria = self.sim_allocations[betmode][sim]
+        attempt_state.sim_results = SimResults()
+        attempt_state.recorded_events = {}
+        attempt_state.attempt_claims = AttemptClaims(self.board, slot, episode)
+        try:
+            attempt_state.run_spin(sim)
+            self.board.report_success()
+        except NoAttemptsLeft:
+            pass
+        finally:
+            self.board.release()
+            attempt_state.attempt_claims = None
+
+    def find_attempt(self, gamestate: object) -> int:
+        """Lowest successful attempt of the gamestate's current sim, run together with any idle workers."""
+        slot = self.board.worker_index
+        episode = self.board.post(gamestate.betmode, gamestate.sim, gamestate.attempt)
+        self.run_attempts(slot, episode, gamestate.betmode, gamestate.sim)
+        while not self.board.is_resolved(slot, episode):
+            time.sleep(POLL_INTERVAL)
+        return self.board.close(slot)
+
+    def retire(self) -> None:
+        """Mark a retired worker done without running attempts, so its memory is released when it exits."""
+        self.board.worker_done()
+
+    def help_until_done(self) -> None:
+        """Run attempts for other workers' posted sims until no worker is still running shards."""
+        self.board.worker_done()
+        while self.board.has_busy_workers():
+            open_slot = self.board.find_open_slot()
+            if open_slot is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            self.run_attempts(*open_slot)
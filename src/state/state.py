@@ -1,20 +1,16 @@
-from copy import copy
+import time
 from abc import ABC, abstractmethod
 from warnings import warn
-import random
 
 # from src.config.config import BetMode
 from src.wins.win_manager import WinManager
 from src.calculations.symbol import SymbolStorage
+from src.calculations.rng import ATTEMPT_SEEDED_MODES, get_sim_rng
 from src.config.output_filenames import OutputFiles
 from src.state.books import Book
-from src.write_data.write_data import (
-    print_recorded_wins,
-    make_lookup_tables,
-    write_json,
-    make_lookup_pay_split,
-    write_library_events,
-)
+from src.state.preload import preload_gamestate
+from src.state.sim_results import SimResults
+from src.write_data.write_data import BookIds, BookWriter, ForceDescriptions, get_shard_payload
 
 
 class GeneralGameState(ABC):
@@ -22,11 +18,20 @@ class GeneralGameState(ABC):
 
     def __init__(self, config):
         self.config = config
+        self.current_betmode = None
+        self.current_distribution = None
+        self.distribution_conditions = None
         self.output_files = OutputFiles(self.config)
         self.win_manager = WinManager(self.config.basegame_type, self.config.freegame_type, config.wincap)
-        self.library = {}
+        self.sim_results = SimResults()
+        self.book_writer = None
+        self.sim_counters = None
+        self.speculation = None
+        self.attempt_claims = None
         self.recorded_events = {}
+        self.force_descriptions = ForceDescriptions()
         self.special_symbol_functions = {}
+        self.reel_symbol_positions = {}
         self.temp_wins = []
         self.create_symbol_map()
         self.assign_special_sym_function()
@@ -35,6 +40,7 @@ class GeneralGameState(ABC):
         self.book = Book(self.sim, self.criteria)
         self.repeat = True
         self.repeat_count = 0
+        self.attempt = 0
         self.win_data = {
             "totalWin": 0,
             "wins": [],
@@ -63,12 +69,13 @@ class GeneralGameState(ABC):
 
     def reset_book(self) -> None:
         """Reset global simulation variables."""
+        self.reset_attempt_seed()
         self.temp_wins = []
         self.board = [[[] for _ in range(self.config.num_rows[x])] for x in range(self.config.num_reels)]
         self.top_symbols = None
         self.bottom_symbols = None
         self.book_id = self.sim + 1
-        self.book = Book(self.book_id, self.criteria)
+        self.book = Book(self.book_id, self.criteria, self.config.check_book_events)
         self.win_data = {
             "totalWin": 0,
             "wins": [],
@@ -85,10 +92,24 @@ class GeneralGameState(ABC):
         self.anticipation = [0] * self.config.num_reels
 
     def reset_seed(self, sim: int = 0) -> None:
-        """Reset rng seed to simulation number for reproducibility."""
-        random.seed(sim + 1)
+        """Create the random stream of a simulation, draws must use self.rng for reproducible books."""
+        self.rng = get_sim_rng(self.config.rng_mode, self.config.rng_seed, getattr(self, "betmode", ""), sim)
         self.sim = sim
         self.repeat_count = 0
+        self.attempt = -1
+
+    def reset_attempt_seed(self) -> None:
+        """
+        Start the next attempt of a sim. With an attempt seeded rng_mode, every attempt draws from a stream seeded by
+        (sim, attempt), so attempts can also be claimed from speculative runs on other workers instead of in order.
+        """
+        self.attempt += 1
+        if self.attempt_claims is not None:
+            self.attempt = self.attempt_claims.claim()
+        elif self.speculation is not None and self.attempt >= self.speculation.speculate_after:
+            self.attempt = self.speculation.find_attempt(self)
+        if self.attempt > 0 and self.config.rng_mode in ATTEMPT_SEEDED_MODES:
+            self.rng = get_sim_rng(self.config.rng_mode, self.config.rng_seed, self.betmode, self.sim, self.attempt)
 
     def reset_fs_spin(self) -> None:
         """Use if using repeat during freespin games."""
@@ -97,8 +118,57 @@ class GeneralGameState(ABC):
         self.gametype = self.config.freegame_type
         self.win_manager.reset_spin_win()
 
+    @property
+    def betmode(self) -> str:
+        """Name of the bet mode being simulated."""
+        return self._betmode
+
+    @betmode.setter
+    def betmode(self, betmode: str) -> None:
+        self._betmode = betmode
+        if betmode:
+            preload_gamestate(self)
+        self.update_bet_context()
+
+    @property
+    def criteria(self) -> str:
+        """Criteria of the sim being simulated."""
+        return self._criteria
+
+    @criteria.setter
+    def criteria(self, criteria: str) -> None:
+        self._criteria = criteria
+        self.update_bet_context()
+
+    def update_bet_context(self) -> None:
+        """
+        Resolve the current bet mode, criteria distribution and its conditions once whenever the bet mode or criteria
+        is assigned, so the many lookups made during each spin are attribute reads. Weight distributions of the
+        conditions are drawn with the samplers preloaded when the bet mode is assigned.
+        """
+        self.current_betmode = None
+        self.current_distribution = None
+        self.distribution_conditions = None
+        betmode_name = getattr(self, "_betmode", None)
+        if betmode_name is None or not hasattr(self, "config"):
+            return
+        for betmode in self.config.bet_modes:
+            if betmode.get_name() == betmode_name:
+                self.current_betmode = betmode
+                break
+        if self.current_betmode is None:
+            return
+        criteria = getattr(self, "_criteria", None)
+        for distribution in self.current_betmode.get_distributions():
+            if distribution._criteria == criteria:
+                self.current_distribution = distribution
+                self.distribution_conditions = distribution._conditions
+                break
+
     def get_betmode(self, mode_name) -> object:
         """Return all current betmode information."""
+        if self.current_betmode is not None and mode_name == self._betmode:
+            return self.current_betmode
         for betmode in self.config.bet_modes:
             if betmode.get_name() == mode_name:
                 return betmode
@@ -106,24 +176,19 @@ class GeneralGameState(ABC):
 
     def get_current_betmode(self) -> object:
         """Get current betmode information."""
-        for betmode in self.config.bet_modes:
-            if betmode.get_name() == self.betmode:
-                return betmode
+        return self.current_betmode
 
     def get_current_betmode_distributions(self) -> object:
         """Return current betmode criteria information."""
-        dist = self.get_current_betmode().get_distributions()
-        for c in dist:
-            if c._criteria == self.criteria:
-                return c
-        raise RuntimeError("Could not locate criteria distribution.")
+        if self.current_distribution is None:
+            raise RuntimeError("Could not locate criteria distribution.")
+        return self.current_distribution
 
     def get_current_distribution_conditions(self) -> dict:
         """Return requirements for criteria setup/acceptance."""
-        for d in self.get_betmode(self.betmode).get_distributions():
-            if d._criteria == self.criteria:
-                return d._conditions
-        return RuntimeError("Could not locate betmode conditions")
+        if self.distribution_conditions is None:
+            return RuntimeError("Could not locate betmode conditions")
+        return self.distribution_conditions
 
     def check_current_repeat_count(self, warn_after_count: int = 1000):
         """Alert user to high repeat count."""
@@ -138,10 +203,7 @@ class GeneralGameState(ABC):
         Freespin triggers are most commonly used, i.e {"kind": X, "symbol": "S", "gametype": "basegame"}
         It is recommended to otherwise record rare events with several keys in order to reduce the overall file-size containing many duplicate ids
         """
-        dstr = {}
-        for k, v in description.items():
-            dstr[str(k)] = str(v)
-        self.temp_wins.append(dstr)
+        self.temp_wins.append(self.force_descriptions.get_id(description))
         self.temp_wins.append(self.book_id)
 
     def check_force_keys(self, description) -> None:
@@ -151,37 +213,48 @@ class GeneralGameState(ABC):
             if keyValue[0] not in current_mode_force_keys:
                 self.get_current_betmode().add_force_key(keyValue[0])  # type:ignore
 
-    def combine(self, modes, betmode_name) -> None:
-        """Retrieve unique force record keys."""
-        for modeConfig in modes:
-            for betmode in modeConfig:
-                if betmode.get_name() == betmode_name:
-                    break
-            force_keys = betmode.get_force_keys()  # type:ignore
+    def combine(self, worker_force_keys, betmode_name) -> None:
+        """Retrieve unique force record keys returned by each worker."""
+        for force_keys in worker_force_keys:
             for key in force_keys:
                 if key not in self.get_betmode(betmode_name).get_force_keys():  # type:ignore
                     self.get_betmode(betmode_name).add_force_key(key)  # type:ignore
 
     def imprint_wins(self) -> None:
-        """Record all events to library if criteria conditions are satisfied."""
-        for temp_win_index in range(int(len(self.temp_wins) / 2)):
-            description = tuple(sorted(self.temp_wins[2 * temp_win_index].items()))
-            book_id = self.temp_wins[2 * temp_win_index + 1]
-            if description in self.recorded_events and (
-                book_id not in self.recorded_events[description]["bookIds"]
-            ):
-                self.recorded_events[description]["timesTriggered"] += 1
-                self.recorded_events[description]["bookIds"] += [book_id]
-            elif description not in self.recorded_events:
-                self.check_force_keys(description)
-                self.recorded_events[description] = {
+        """Record all events and the sim result if criteria conditions are satisfied."""
+        for temp_win_index in range(0, len(self.temp_wins), 2):
+            description_id = self.temp_wins[temp_win_index]
+            book_id = self.temp_wins[temp_win_index + 1]
+            record = self.recorded_events.get(description_id)
+            if record is None:
+                self.check_force_keys(self.force_descriptions.get_description(description_id))
+                self.recorded_events[description_id] = {
                     "timesTriggered": 1,
-                    "bookIds": [book_id],
+                    "bookIds": BookIds([book_id]),
                 }
+            elif record["bookIds"].add(book_id):
+                record["timesTriggered"] += 1
         self.temp_wins = []
-        self.library[self.sim + 1] = copy(self.book.to_json())
+        book_json = self.book.to_json()
+        if self.book_writer is not None:
+            self.book_writer.write(book_json)
+        self.sim_results.add(
+            book_json["id"],
+            book_json["payoutMultiplier"],
+            book_json["baseGameWins"],
+            book_json["freeGameWins"],
+            book_json["criteria"],
+            self.attempt,
+        )
         self.win_manager.update_end_round_wins()
 
+    def get_recorded_events(self) -> dict:
+        """Recorded events keyed by the string form of their description, as written to force files."""
+        return {
+            self.force_descriptions.get_description(description_id): record
+            for description_id, record in self.recorded_events.items()
+        }
+
     def update_final_win(self) -> None:
         """Separate base and freegame wins, verify the sum of there are equal to the final simulation payout."""
         final = round(min(self.win_manager.running_bet_win, self.config.wincap), 2)
@@ -234,15 +307,15 @@ class GeneralGameState(ABC):
         betmode_copy_list,
         betmode,
         sim_to_criteria,
-        total_threads,
-        total_repeats,
-        num_sims,
-        thread_index,
-        repeat_count,
+        sim_range,
+        shard_index,
         compress=True,
         write_event_list=True,
-    ) -> None:
-        """Assigns criteria and runs individual simulations. Results are stored in temporary file to be combined when all threads are finished."""
+    ) -> dict:
+        """
+        Assigns criteria and runs simulations [start, end). Books are streamed to a temporary shard file as each
+        simulation finishes, lookup rows, recorded events and event examples are returned as a compact shard payload.
+        """
         mode_max_win = None
         for bm in self.config.bet_modes:
             if bm._name.lower() == betmode.lower():
@@ -250,36 +323,37 @@ class GeneralGameState(ABC):
         assert mode_max_win is not None
 
         self.win_manager = WinManager(self.config.basegame_type, self.config.freegame_type, mode_max_win)
-        self.library = {}
+        self.sim_results = SimResults()
+        self.recorded_events = {}
+        self.temp_wins = []
         self.betmode = betmode
-        self.num_sims = num_sims
-        for sim in range(
-            thread_index * num_sims + (total_threads * num_sims) * repeat_count,
-            (thread_index + 1) * num_sims + (total_threads * num_sims) * repeat_count,
-        ):
-            self.criteria = sim_to_criteria[sim]
-            self.run_spin(sim)
+        self.num_sims = sim_range[1] - sim_range[0]
+        self.book_writer = BookWriter(
+            self.output_files.get_temp_multi_thread_name(betmode, shard_index, compress),
+            collect_events=write_event_list,
+        )
+        try:
+            for sim in range(*sim_range):
+                self.criteria = sim_to_criteria[sim]
+                start_time = time.perf_counter_ns()
+                self.run_spin(sim)
+                if self.sim_counters is not None:
+                    self.sim_counters.record_sim(
+                        betmode, self.criteria, self.attempt + 1, time.perf_counter_ns() - start_time
+                    )
+        finally:
+            self.book_writer.close()
         mode_cost = self.get_current_betmode().get_cost()
 
         print(
-            "Thread " + str(thread_index),
+            "Shard " + str(shard_index),
             "finished with",
-            round(self.win_manager.total_cumulative_wins / (num_sims * mode_cost), 3),
+            round(self.win_manager.total_cumulative_wins / (self.num_sims * mode_cost), 3),
             "RTP.",
-            f"[baseGame: {round(self.win_manager.cumulative_base_wins/(num_sims*mode_cost), 3)}, freeGame: {round(self.win_manager.cumulative_free_wins/(num_sims*mode_cost), 3)}]",
+            f"[baseGame: {round(self.win_manager.cumulative_base_wins/(self.num_sims*mode_cost), 3)}, "
+            f"freeGame: {round(self.win_manager.cumulative_free_wins/(self.num_sims*mode_cost), 3)}]",
             flush=True,
         )
 
-        write_json(
-            self,
-            self.output_files.get_temp_multi_thread_name(
-                betmode, thread_index, repeat_count, (compress) * True + (not compress) * False
-            ),
-        )
-        print_recorded_wins(self, self.output_files.get_temp_force_name(betmode, thread_index, repeat_count))
-        make_lookup_tables(self, self.output_files.get_temp_lookup_name(betmode, thread_index, repeat_count))
-        make_lookup_pay_split(self, self.output_files.get_temp_segmented_name(betmode, thread_index, repeat_count))
-
-        if write_event_list:
-            write_library_events(self, list(self.library.values()), betmode)
-        betmode_copy_list.append(self.config.bet_modes)
+        betmode_copy_list.append(list(self.get_current_betmode().get_force_keys()))
+        return get_shard_payload(self, self.book_writer.event_items if write_event_list else None)
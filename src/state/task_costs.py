@@ -0,0 +1,89 @@
+"""Estimate the cost of each simulation shard from the cost of its criteria, so expensive modes are run first."""
+
+import os
+import json
+import time
+from typing import Dict, List, Tuple
+
+MIN_LIVE_SIMS = 20
+REORDER_INTERVAL = 5.0
+
+
+def load_criteria_costs(filename: str) -> Dict[str, float]:
+    """Seconds per accepted sim of each 'betmode:criteria' recorded by previous runs."""
+    if not os.path.isfile(filename):
+        return {}
+    try:
+        with open(filename, "r", encoding="UTF-8") as f:
+            return {key: float(cost) for key, cost in json.load(f).items()}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        return {}
+
+
+def save_criteria_costs(filename: str, criteria_seconds: Dict[str, Tuple[int, float]]) -> None:
+    """Add the measured seconds per accepted sim of every criteria with finished sims to the recorded costs."""
+    costs = load_criteria_costs(filename)
+    for key, (sims, seconds) in criteria_seconds.items():
+        if sims > 0:
+            costs[key] = seconds / sims
+    with open(filename, "w", encoding="UTF-8") as f:
+        f.write(json.dumps(costs, indent=4, sort_keys=True))
+
+
+class TaskCosts:
+    """
+    Estimated cost of every (betmode, shard) task: the number of sims of each criteria in the shard times the
+    criteria's seconds per accepted sim. Costs start from previous runs and are replaced by live measurements once
+    a criteria has MIN_LIVE_SIMS finished sims. Criteria without a cost use the average of the known criteria costs.
+    Tasks are dispatched by the cost of their whole mode, so modes run most expensive first while the shards of a mode
+    run in shard order and are merged as they finish, without holding later shards back.
+    """
+
+    def __init__(self, tasks: List[Tuple[str, int]], mode_plans: Dict[str, tuple], criteria_costs: Dict[str, float]):
+        self.criteria_costs = dict(criteria_costs)
+        self.task_modes = [betmode for betmode, _ in tasks]
+        self.task_counts = []
+        for betmode, shard_index in tasks:
+            sim_chunks, sim_allocation = mode_plans[betmode]
+            counts = sim_allocation.get_criteria_counts(*sim_chunks[shard_index])
+            self.task_counts.append(
+                [
+                    (f"{betmode}:{criteria}", count)
+                    for criteria, count in zip(sim_allocation.criteria, counts)
+                    if count > 0
+                ]
+            )
+        self.keys = set(key for counts in self.task_counts for key, _ in counts)
+        self.last_update = time.time()
+
+    def get_costs(self) -> List[float]:
+        """Estimated cost of each task."""
+        known_keys = self.keys & set(self.criteria_costs)
+        default_cost = 1.0
+        if len(known_keys) > 0:
+            default_cost = sum(self.criteria_costs[key] for key in known_keys) / len(known_keys)
+        return [
+            sum(count * self.criteria_costs.get(key, default_cost) for key, count in counts)
+            for counts in self.task_counts
+        ]
+
+    def get_mode_priorities(self) -> List[float]:
+        """Dispatch priority of each task, the estimated cost of all tasks of its mode."""
+        mode_costs = {}
+        for betmode, cost in zip(self.task_modes, self.get_costs()):
+            mode_costs[betmode] = mode_costs.get(betmode, 0.0) + cost
+        return [mode_costs[betmode] for betmode in self.task_modes]
+
+    def update(self, criteria_seconds: Dict[str, Tuple[int, float]]) -> None:
+        """Use live (accepted sims, seconds) measurements of criteria with enough finished sims."""
+        for key, (sims, seconds) in criteria_seconds.items():
+            if sims >= MIN_LIVE_SIMS:
+                self.criteria_costs[key] = seconds / sims
+
+    def reorder(self, scheduler: object, sim_counters: object) -> None:
+        """Every REORDER_INTERVAL, order the scheduler's remaining tasks by mode costs learned from the sim counters."""
+        if time.time() - self.last_update < REORDER_INTERVAL:
+            return
+        self.update(sim_counters.get_criteria_seconds())
+        scheduler.reorder(self.get_mode_priorities())
+        self.last_update = time.time()
@@ -0,0 +1,177 @@
+"""Live simulation progress, published by workers through shared memory and reported by the parent."""
+
+import copy
+import json
+import time
+import threading
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List, Tuple
+
+STRAGGLER_FRACTION = 0.5
+
+
+class SimCounters:
+    """
+    Per-worker counters in shared memory: sims finished, repeated attempts and accepted/rejected attempts and
+    nanoseconds spent for each (betmode, criteria). Every worker only writes its own slots, so no locking is needed.
+    """
+
+    def __init__(self, num_workers: int, criteria: List[Tuple[str, str]]):
+        self.num_workers = num_workers
+        self.criteria = list(criteria)
+        self.criteria_index = {key: 2 + 3 * idx for idx, key in enumerate(self.criteria)}
+        self.stride = 2 + 3 * len(self.criteria)
+        self.values = RawArray("q", num_workers * self.stride)
+        self.worker_offset = 0
+
+    def for_worker(self, worker_index: int) -> "SimCounters":
+        """View of the shared counters which writes to a single worker's slots."""
+        worker_counters = copy.copy(self)
+        worker_counters.worker_offset = worker_index * self.stride
+        return worker_counters
+
+    def record_sim(self, betmode: str, criteria: str, attempts: int, nanoseconds: int = 0) -> None:
+        """Count a finished sim, every attempt before the accepted one was a repeat."""
+        offset = self.worker_offset
+        criteria_offset = offset + self.criteria_index[(betmode, criteria)]
+        self.values[offset] += 1
+        self.values[offset + 1] += attempts - 1
+        self.values[criteria_offset] += 1
+        self.values[criteria_offset + 1] += attempts - 1
+        self.values[criteria_offset + 2] += nanoseconds
+
+    def get_worker_totals(self) -> List[Tuple[int, int]]:
+        """(sims, repeats) for each worker."""
+        return [
+            (self.values[worker * self.stride], self.values[worker * self.stride + 1])
+            for worker in range(self.num_workers)
+        ]
+
+    def get_criteria_totals(self) -> Dict[str, Dict[str, int]]:
+        """Accepted and rejected attempts for each betmode criteria, summed over workers."""
+        totals = {}
+        for (betmode, criteria), idx in self.criteria_index.items():
+            accepted = sum(self.values[worker * self.stride + idx] for worker in range(self.num_workers))
+            rejected = sum(self.values[worker * self.stride + idx + 1] for worker in range(self.num_workers))
+            totals[f"{betmode}:{criteria}"] = {"accepted": accepted, "rejected": rejected}
+        return totals
+
+    def get_criteria_seconds(self) -> Dict[str, Tuple[int, float]]:
+        """(accepted sims, seconds spent) for each betmode criteria, summed over workers."""
+        criteria_seconds = {}
+        for (betmode, criteria), idx in self.criteria_index.items():
+            accepted = sum(self.values[worker * self.stride + idx] for worker in range(self.num_workers))
+            nanoseconds = sum(self.values[worker * self.stride + idx + 2] for worker in range(self.num_workers))
+            criteria_seconds[f"{betmode}:{criteria}"] = (accepted, nanoseconds / 1e9)
+        return criteria_seconds
+
+
+class ProgressReporter:
+    """
+    Background thread in the parent process, reports throughput, ETA and slow workers at a fixed interval.
+    Each report is optionally appended to a jsonl metrics file.
+    """
+
+    def __init__(self, counters: SimCounters, total_sims: int, interval: float = 10.0, metrics_file: str = None):
+        self.counters = counters
+        self.total_sims = total_sims
+        self.interval = interval
+        self.metrics_file = metrics_file
+        self.start_time = None
+        self.last_time = None
+        self.last_worker_sims = [0] * counters.num_workers
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        """Begin periodic reporting."""
+        self.start_time = self.last_time = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """Report until stopped."""
+        while not self.stop_event.wait(self.interval):
+            self.report()
+
+    def stop(self) -> None:
+        """Stop reporting and write a final report, nothing is reported if reporting was never started."""
+        if self.start_time is None:
+            return
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.report(final=True)
+
+    def get_metrics(self) -> dict:
+        """Current progress, throughput since the previous report and slow workers."""
+        now = time.time()
+        worker_totals = self.counters.get_worker_totals()
+        sims = sum(worker_sims for worker_sims, _ in worker_totals)
+        repeats = sum(worker_repeats for _, worker_repeats in worker_totals)
+        elapsed = now - self.start_time
+        interval = max(now - self.last_time, 1e-9)
+        worker_rates = [
+            (worker_sims - last_sims) / interval
+            for (worker_sims, _), last_sims in zip(worker_totals, self.last_worker_sims)
+        ]
+        recent_rate = sum(worker_rates)
+        overall_rate = sims / elapsed if elapsed > 0 else 0.0
+        rate = recent_rate if recent_rate > 0 else overall_rate
+        eta = (self.total_sims - sims) / rate if rate > 0 else None
+
+        median_rate = sorted(worker_rates)[len(worker_rates) // 2]
+        stragglers = []
+        if sims < self.total_sims and median_rate > 0:
+            stragglers = [
+                worker
+                for worker, worker_rate in enumerate(worker_rates)
+                if worker_rate < STRAGGLER_FRACTION * median_rate
+            ]
+
+        self.last_time = now
+        self.last_worker_sims = [worker_sims for worker_sims, _ in worker_totals]
+        return {
+            "time": now,
+            "elapsed": elapsed,
+            "sims": sims,
+            "total_sims": self.total_sims,
+            "repeats": repeats,
+            "sims_per_sec": overall_rate,
+            "recent_sims_per_sec": recent_rate,
+            "eta": eta,
+            "workers": [
+                {"sims": worker_sims, "repeats": worker_repeats, "sims_per_sec": worker_rate}
+                for (worker_sims, worker_repeats), worker_rate in zip(worker_totals, worker_rates)
+            ],
+            "stragglers": stragglers,
+            "criteria": self.counters.get_criteria_totals(),
+        }
+
+    def report(self, final: bool = False) -> None:
+        """Print progress and append metrics."""
+        metrics = self.get_metrics()
+        percent = 100 * metrics["sims"] / max(self.total_sims, 1)
+        attempts = metrics["sims"] + metrics["repeats"]
+        repeat_percent = 100 * metrics["repeats"] / max(attempts, 1)
+        if final:
+            print(
+                f"Simulated {metrics['sims']} sims in {round(metrics['elapsed'], 1)}s,",
+                f"{round(metrics['sims_per_sec'], 1)} sims/s, {round(repeat_percent, 1)}% of attempts repeated.",
+                flush=True,
+            )
+        else:
+            eta = "unknown" if metrics["eta"] is None else f"{round(metrics['eta'])}s"
+            worker_rates = " ".join(str(round(worker["sims_per_sec"])) for worker in metrics["workers"])
+            print(
+                f"Progress: {metrics['sims']}/{self.total_sims} sims ({round(percent, 1)}%),",
+                f"{round(metrics['recent_sims_per_sec'], 1)} sims/s, ETA {eta}, {round(repeat_percent, 1)}% repeats.",
+                f"Worker sims/s: [{worker_rates}]",
+                flush=True,
+            )
+            if len(metrics["stragglers"]) > 0:
+                print("Slow workers:", metrics["stragglers"], flush=True)
+
+        if self.metrics_file is not None:
+            with open(self.metrics_file, "a", encoding="UTF-8") as f:
+                f.write(json.dumps({**metrics, "final": final}) + "\n")
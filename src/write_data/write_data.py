@@ -4,9 +4,15 @@ from collections import defaultdict
 from warnings import warn
 import shutil
 import os
+import io
+import sys
+import zlib
+import base64
 import hashlib
 import json
 import ast
+from array import array
+from typing import Iterable
 import zstandard as zstd
 
 
@@ -74,127 +80,359 @@ def get_force_options(force_results: dict):
     return {key: list(val) for key, val in force_keys.items()}
 
 
-def make_lookup_tables(gamestate: object, name: str):
-    """Write lookup tables for all simulations."""
-    file = open(name, "w", encoding="UTF-8")
-    sims = list(gamestate.library.keys())
-    sims.sort()
-    for sim in sims:
-        file.write("{},1,{}\n".format(gamestate.library[sim]["id"], gamestate.library[sim]["payoutMultiplier"]))
-    file.close()
-
-
-def make_lookup_pay_split(gamestate: object, name: str):
-    """Record win values from basegame and freegame types."""
-    file = open(name, "w", encoding="UTF-8")
-    sims = list(gamestate.library.keys())
-    sims.sort()
-    for sim in sims:
-        file.write(
-            str(gamestate.library[sim]["id"])
-            + ","
-            + str(gamestate.library[sim]["criteria"])
-            + ","
-            + str(round(gamestate.library[sim]["baseGameWins"], 2))
-            + ","
-            + str(round(gamestate.library[sim]["freeGameWins"], 2))
-            + "\n"
-        )
-    file.close()
-
-
-def write_library_events(gamestate: object, library: list, gametype: str):
+def get_lookup_rows(gamestate: object) -> str:
+    """Lookup table rows of all simulations recorded in the gamestate's sim results."""
+    return gamestate.sim_results.get_lookup_rows()
+
+
+def get_pay_split_rows(gamestate: object) -> str:
+    """Basegame and freegame win rows of all simulations recorded in the gamestate's sim results."""
+    return gamestate.sim_results.get_pay_split_rows()
+
+
+def pack_bytes(data: bytes) -> str:
+    """Compress bytes into an ascii payload, which can be passed between processes and stored in json."""
+    return base64.b64encode(zlib.compress(data)).decode("ascii")
+
+
+def unpack_bytes(payload: str) -> bytes:
+    """Bytes of a payload created by pack_bytes."""
+    return zlib.decompress(base64.b64decode(payload))
+
+
+def pack_text(text: str) -> str:
+    """Compress text into an ascii payload."""
+    return pack_bytes(text.encode("UTF-8"))
+
+
+def unpack_text(payload: str) -> str:
+    """Text of a payload created by pack_text."""
+    return unpack_bytes(payload).decode("UTF-8")
+
+
+class BookIds:
+    """
+    Book ids recorded for a force description, held in a growable array of 64-bit ints.
+    Ids are recorded in increasing sim order, so a new id is appended and a repeat of the latest id is rejected
+    without searching. The first id below the largest recorded one builds a set of the recorded ids, which then
+    backs every further duplicate check.
+    """
+
+    __slots__ = ("ids", "max_id", "seen")
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.ids = array("q", ids)
+        self.max_id = max(self.ids, default=-1)
+        self.seen = None
+
+    def add(self, book_id: int) -> bool:
+        """Record a book id unless it is already recorded, returns whether it was added."""
+        if book_id <= self.max_id:
+            if book_id == self.ids[-1]:
+                return False
+            if self.seen is None:
+                self.seen = set(self.ids)
+            if book_id in self.seen:
+                return False
+        else:
+            self.max_id = book_id
+        if self.seen is not None:
+            self.seen.add(book_id)
+        self.ids.append(book_id)
+        return True
+
+    def extend(self, other: "BookIds") -> None:
+        """Append the ids of a later shard."""
+        self.ids.extend(other.ids)
+        self.max_id = max(self.max_id, other.max_id)
+        if self.seen is not None:
+            self.seen.update(other.ids)
+
+    def to_list(self) -> list:
+        """Ids as python ints."""
+        return self.ids.tolist()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BookIds):
+            return self.ids == other.ids
+        return self.to_list() == other
+
+    def __repr__(self) -> str:
+        return repr(self.to_list())
+
+
+class ForceDescriptions:
+    """
+    Interns force descriptions to small integer ids, so recording a win appends two ints.
+    A description dict is looked up by its items and value types. The first time a description is seen, its string
+    form, the sorted (str(key), str(value)) pairs written to force files, is built and given an id. Descriptions with
+    the same string form share an id.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.string_ids = {}
+        self.descriptions = []
+
+    def get_id(self, description: dict) -> int:
+        """Id of a description dict."""
+        key = (*description.items(), *map(type, description.values()))
+        try:
+            description_id = self.ids.get(key)
+        except TypeError:
+            return self.get_string_id(description)
+        if description_id is None:
+            description_id = self.get_string_id(description)
+            self.ids[key] = description_id
+        return description_id
+
+    def get_string_id(self, description: dict) -> int:
+        """Id of a description's string form, added if it is new."""
+        description_string = tuple(sorted((str(key), str(value)) for key, value in description.items()))
+        description_id = self.string_ids.get(description_string)
+        if description_id is None:
+            description_id = len(self.descriptions)
+            self.string_ids[description_string] = description_id
+            self.descriptions.append(description_string)
+        return description_id
+
+    def get_description(self, description_id: int) -> tuple:
+        """String form of an interned description."""
+        return self.descriptions[description_id]
+
+
+def encode_book_ids(value: object) -> list:
+    """json default for BookIds, so force records are serialized without building intermediate lists."""
+    if isinstance(value, BookIds):
+        return value.to_list()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def pack_recorded_events(recorded_events: dict) -> dict:
+    """
+    Recorded events as payloads: descriptions with their trigger counts and number of ids as python repr, so
+    description keys are restored unchanged, and all book ids as one block of little-endian int64.
+    """
+    all_ids = array("q")
+    records = []
+    for description, record in recorded_events.items():
+        records.append((description, record["timesTriggered"], len(record["bookIds"])))
+        all_ids.extend(record["bookIds"].ids)
+    if sys.byteorder == "big":
+        all_ids.byteswap()
+    return {"force": pack_text(repr(records)), "force_ids": pack_bytes(all_ids.tobytes())}
+
+
+def unpack_recorded_events(shard_result: dict) -> dict:
+    """Recorded events of payloads created by pack_recorded_events."""
+    all_ids = array("q")
+    all_ids.frombytes(unpack_bytes(shard_result["force_ids"]))
+    if sys.byteorder == "big":
+        all_ids.byteswap()
+    recorded_events = {}
+    start = 0
+    for description, times_triggered, num_ids in ast.literal_eval(unpack_text(shard_result["force"])):
+        recorded_events[description] = {
+            "timesTriggered": times_triggered,
+            "bookIds": BookIds(all_ids[start : start + num_ids]),
+        }
+        start += num_ids
+    return recorded_events
+
+
+def get_shard_payload(gamestate: object, event_items: dict = None) -> dict:
+    """
+    Lookup rows, pay split rows and recorded events of a finished shard, returned by the worker instead of being
+    written to temp files.
+    """
+    return {
+        "lookup": pack_text(get_lookup_rows(gamestate)),
+        "segmented": pack_text(get_pay_split_rows(gamestate)),
+        **pack_recorded_events(gamestate.get_recorded_events()),
+        "events": event_items,
+    }
+
+
+def write_library_events(output_files: object, event_items: dict, gametype: str):
     """Write all unique events within a given mode - with one example application."""
-    unique_event = []
-    event_items = {}
-    for event in library:
-        for instance in event["events"]:
-            lib_event = instance["type"]
-            if lib_event not in unique_event:
-                unique_event.append(lib_event)
-                item_keys = instance.keys()
-                dict_details = {key: instance[key] for key in item_keys if key != "index"}
-                event_items[lib_event] = dict_details
     json_object = json.dumps(event_items, indent=4)
     with open(
-        os.path.join(gamestate.output_files.config_path, f"event_config_{gametype}.json"),
+        os.path.join(output_files.config_path, f"event_config_{gametype}.json"),
         "w",
         encoding="UTF-8",
     ) as f:
         f.write(json_object)
 
 
-def output_lookup_and_force_files(
-    threads: int,
-    batching_size: int,
-    game_id: str,
-    betmode: str,
-    gamestate: object,
-    num_sims: int = 1000000,
-    compress: bool = True,
-):
-    """Combine temporary lookup tables and force files into a single output."""
-    print("Saving books for ", game_id, "in", betmode)
-    num_repeats = max(int(round(num_sims / threads / batching_size, 0)), 1)
-    file_list = []
-    for repeat_index in range(num_repeats):
-        for thread in range(threads):
-            file_list.append(
-                gamestate.output_files.get_temp_multi_thread_name(betmode, thread, repeat_index, compress)
-            )
+def concatenate_zstd_frames(file_list: list, outfile: io.BufferedIOBase) -> None:
+    """Append compressed shards without decompressing. Concatenated zstd frames form a single valid stream."""
+    for fname in file_list:
+        with open(fname, "rb") as infile:
+            shutil.copyfileobj(infile, outfile)
 
-    if compress:
-        temp_book_output_path = os.path.join(gamestate.output_files.book_path, "temp_book_output.json")
-        with open(temp_book_output_path, "w", encoding="UTF-8") as outfile:
-            for fname in file_list:
-                with open(fname, "rb") as infile:
-                    decompressed = zstd.ZstdDecompressor().decompress(infile.read())
-                    outfile.write(decompressed.decode("UTF-8"))
 
-        final_out = gamestate.output_files.get_final_book_name(betmode, True)
-        with open(temp_book_output_path, "rb") as f_in, open(final_out, "wb") as f_out:
-            f_out.write(zstd.ZstdCompressor().compress(f_in.read()))
-
-        os.remove(temp_book_output_path)
-    else:
-        with open(
-            gamestate.output_files.get_final_book_name(betmode, False),
-            "w",
-            encoding="UTF-8",
-        ) as outfile:
-            for id, filename in enumerate(file_list):
-                with open(filename, "r", encoding="UTF-8") as infile:
-                    file_data = infile.read()
-                    if filename.endswith(".jsonl"):
-                        outfile.write(file_data)
-                    elif filename.endswith(".json"):
-                        if id == 0 and len(file_list) == 1:
-                            outfile.write(file_data)
-                        elif id == 0 and len(file_list) > 1:
-                            outfile.write(file_data[:-1])  # don't write final ']'
-                        elif id != len(file_list) - 1:
-                            outfile.write("," + file_data[1:-1])  # don't write first or last '[/]'
-                        else:
-                            outfile.write("," + file_data[1::])  # dont write first '[', write last ']'
-
-    print("Saving force files for", game_id, "in", betmode)
-    force_results_dict = {}
-    file_list = []
-    for repeat_index in range(num_repeats):
-        for thread in range(threads):
-            file_list.append(
-                gamestate.output_files.get_temp_force_name(betmode, thread, repeat_index),
+def verify_books_stream(books_file: str) -> int:
+    """Decode a compressed books file across all frames and return the number of books it contains."""
+    num_books = 0
+    last_char = b"\n"
+    with open(books_file, "rb") as f:
+        with zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+            while True:
+                chunk = reader.read(2**20)
+                if not chunk:
+                    break
+                num_books += chunk.count(b"\n")
+                last_char = chunk[-1:]
+    if last_char != b"\n":
+        raise RuntimeError(f"{books_file} does not end with a complete book.")
+    return num_books
+
+
+def merge_force_chunk(force_results_dict: dict, force_chunk: dict) -> None:
+    """Accumulate recorded events from a single shard."""
+    for key in force_chunk:
+        if force_results_dict.get(key) is not None:
+            force_results_dict[key]["timesTriggered"] += force_chunk[key]["timesTriggered"]
+            force_results_dict[key]["bookIds"].extend(force_chunk[key]["bookIds"])
+        else:
+            force_results_dict[key] = force_chunk[key]
+
+
+class ShardMerger:
+    """
+    Combine finished shards into the final mode outputs.
+    Shards can finish in any order, each is appended as soon as all earlier shards have been merged, so merging
+    runs alongside the simulation of later shards. Force records are written once all shards are merged.
+    Books are read from each shard's file, lookup rows, force records and events from the shard result payload.
+    Book files are read from the temp directory, unless shard_files lists the books file of each shard.
+    """
+
+    def __init__(
+        self,
+        game_id: str,
+        betmode: str,
+        output_files: object,
+        num_shards: int,
+        compress: bool = True,
+        shard_files: list = None,
+        write_event_list: bool = False,
+    ):
+        self.game_id = game_id
+        self.betmode = betmode
+        self.output_files = output_files
+        self.num_shards = num_shards
+        self.compress = compress
+        self.shard_files = shard_files
+        self.write_event_list = write_event_list
+        self.next_shard = 0
+        self.finished_shards = {}
+        self.force_results_dict = {}
+        self.force_options = None
+        self.event_items = {}
+        self.num_lookup_rows = 0
+        self.regular_json = False
+        self.is_finalized = False
+
+        book_name = output_files.get_final_book_name(betmode, compress)
+        if compress:
+            self.book_file = open(book_name, "wb")
+        else:
+            self.book_file = open(book_name, "w", encoding="UTF-8")
+            self.regular_json = book_name.endswith(".json")
+            self.wrote_regular_json_books = False
+            if self.regular_json:
+                self.book_file.write("[")
+        self.lookup_file = open(output_files.get_final_lookup_name(betmode), "w", encoding="UTF-8")
+        self.segmented_file = open(output_files.get_final_segmented_name(betmode), "w", encoding="UTF-8")
+
+    def is_complete(self) -> bool:
+        """All shards have been merged."""
+        return self.next_shard == self.num_shards
+
+    def add_shard(self, shard_index: int, shard_result: dict) -> None:
+        """Hold a finished shard's result and merge every shard which is now next in order."""
+        self.finished_shards[shard_index] = shard_result
+        while self.next_shard in self.finished_shards:
+            self.merge_shard(self.next_shard, self.finished_shards.pop(self.next_shard))
+            self.next_shard += 1
+
+    def get_book_name(self, shard_index: int) -> str:
+        """Books file of a shard."""
+        if self.shard_files is not None:
+            return self.shard_files[shard_index]
+        return self.output_files.get_temp_multi_thread_name(self.betmode, shard_index, self.compress)
+
+    def merge_shard(self, shard_index: int, shard_result: dict) -> None:
+        """Append a single shard to the final books, lookup tables, force records and event examples."""
+        book_name = self.get_book_name(shard_index)
+        if self.compress:
+            concatenate_zstd_frames([book_name], self.book_file)
+        else:
+            with open(book_name, "r", encoding="UTF-8") as infile:
+                file_data = infile.read()
+            if self.regular_json:
+                file_data = file_data[1:-1]  # strip '[' and ']' of each shard
+                if len(file_data) > 0:
+                    self.book_file.write(("," if self.wrote_regular_json_books else "") + file_data)
+                    self.wrote_regular_json_books = True
+            else:
+                self.book_file.write(file_data)
+
+        merge_force_chunk(self.force_results_dict, unpack_recorded_events(shard_result))
+        lookup_rows = unpack_text(shard_result["lookup"])
+        self.num_lookup_rows += lookup_rows.count("\n")
+        self.lookup_file.write(lookup_rows)
+        self.segmented_file.write(unpack_text(shard_result["segmented"]))
+        # first example of each event type in sim order, identical for any thread count
+        for event_type, event_item in (shard_result.get("events") or {}).items():
+            self.event_items.setdefault(event_type, event_item)
+
+    def finalize(self, write_force_options: bool = True) -> None:
+        """
+        Close merged outputs, verify books and write the force record. The mode's force options are added to
+        force.json unless write_force_options is False, write_force_options() must then be called once finalized.
+        """
+        assert self.is_complete(), f"{self.num_shards - self.next_shard} shards have not been merged."
+        print("Saving books for", self.game_id, "in", self.betmode)
+        if self.regular_json:
+            self.book_file.write("]")
+        self.book_file.close()
+        self.lookup_file.close()
+        self.segmented_file.close()
+        if self.compress:
+            num_books = verify_books_stream(self.output_files.get_final_book_name(self.betmode, True))
+            if num_books != self.num_lookup_rows:
+                raise RuntimeError(f"Merged books contain {num_books} sims, expected {self.num_lookup_rows}.")
+
+        print("Saving force files for", self.game_id, "in", self.betmode)
+        write_force_record(self.output_files, self.betmode, self.force_results_dict)
+        self.force_options = get_force_options(self.force_results_dict)
+        if write_force_options:
+            self.write_force_options()
+        if self.write_event_list:
+            write_library_events(self.output_files, self.event_items, self.betmode)
+
+        # Write _0 file if it does not exist
+        if not (os.path.exists(self.output_files.get_optimized_lookup_name(self.betmode))):
+            shutil.copy(
+                self.output_files.get_final_lookup_name(self.betmode),
+                self.output_files.get_optimized_lookup_name(self.betmode),
             )
+        self.is_finalized = True
 
-    for filename in file_list:
-        force_chunk = ast.literal_eval(json.load(open(filename, "r", encoding="UTF-8")))
-        for key in force_chunk:
-            if force_results_dict.get(key) is not None:
-                force_results_dict[key]["timesTriggered"] += force_chunk[key]["timesTriggered"]
-                force_results_dict[key]["bookIds"] += force_chunk[key]["bookIds"]
-            else:
-                force_results_dict[key] = force_chunk[key]
+    def write_force_options(self) -> None:
+        """Add the unique force keys of the finalized mode to force.json."""
+        write_force_options(self.output_files, self.betmode, self.force_options)
 
+
+def write_force_record(output_files: object, betmode: str, force_results_dict: dict) -> None:
+    """Write mode force record."""
     force_results_dict_just_for_rob = []
     for force_combination in force_results_dict:
         search_dict = []
@@ -207,82 +445,69 @@ def output_lookup_and_force_files(
         }
         force_results_dict_just_for_rob.append(force_dict)
 
-    json_object_for_rob = json.dumps(force_results_dict_just_for_rob, indent=4)
-    force_record_path = os.path.join(gamestate.output_files.force_path, f"force_record_{betmode}.json")
+    force_record_path = os.path.join(output_files.force_path, f"force_record_{betmode}.json")
     with open(force_record_path, "w", encoding="UTF-8") as file:
-        file.write(json_object_for_rob)
+        json.dump(force_results_dict_just_for_rob, file, indent=4, default=encode_book_ids)
+
 
-    forceResultKeys = get_force_options(force_results_dict)
-    json_file_path = os.path.join(gamestate.output_files.force_path, "force.json")
+def write_force_options(output_files: object, betmode: str, forceResultKeys: dict) -> None:
+    """Update force.json with all unique force keys of a mode."""
+    json_file_path = os.path.join(output_files.force_path, "force.json")
     try:
         with open(json_file_path, "r", encoding="UTF-8") as file:
             data = json.load(file)
     except FileNotFoundError:
         data = {}
-    data[gamestate.get_current_betmode().get_name()] = forceResultKeys
+    data[betmode] = forceResultKeys
     json_object = json.dumps(data, indent=4)
     with open(json_file_path, "w", encoding="UTF-8") as file:
         file.write(json_object)
 
-    weights_plus_wins_file_list = []
-    segmented_lut_file_list = []
-    print("Saving LUTs for", game_id, "in", betmode)
-    for repeat_index in range(num_repeats):
-        for thread in range(threads):
-            weights_plus_wins_file_list += [
-                gamestate.output_files.get_temp_lookup_name(betmode, thread, repeat_index)
-            ]
-            segmented_lut_file_list += [
-                gamestate.output_files.get_temp_segmented_name(betmode, thread, repeat_index)
-            ]
-
-    with open(
-        gamestate.output_files.get_final_lookup_name(betmode),
-        "w",
-        encoding="UTF-8",
-    ) as outfile:
-        for filename in weights_plus_wins_file_list:
-            with open(filename, "r", encoding="UTF-8") as infile:
-                outfile.write(infile.read())
-
-    # Write _0 file if it does not exist
-    if not (os.path.exists(gamestate.output_files.get_optimized_lookup_name(betmode))):
-        shutil.copy(
-            gamestate.output_files.get_final_lookup_name(betmode),
-            gamestate.output_files.get_optimized_lookup_name(betmode),
-        )
-    with open(
-        gamestate.output_files.get_final_segmented_name(betmode),
-        "w",
-        encoding="UTF-8",
-    ) as outfile:
-        for filename in segmented_lut_file_list:
-            with open(filename, "r", encoding="UTF-8") as infile:
-                outfile.write(infile.read())
-
-
-def write_json(gamestate, filename: str):
-    """Convert the list of dictionaries to a JSON-encoded string and compress it in chunks."""
-    json_objects = [json.dumps(item) for item in gamestate.library.values()]
-    combined_data = "\n".join(json_objects) + "\n"
-
-    if filename.endswith(".zst"):
-        compressor = zstd.ZstdCompressor()
-        compressed_data = compressor.compress(combined_data.encode("UTF-8"))
-        with open(filename, "wb") as f:
-            f.write(compressed_data)
-    else:
-        with open(filename, "w", encoding="UTF-8") as f:
-            if not (gamestate.config.output_regular_json):
-                f.write(combined_data)
-            else:
-                j_regular = [item for item in gamestate.library.values()]
-                f.write(json.dumps(j_regular))
-
 
-def print_recorded_wins(gamestate: object, name: str = ""):
-    """Temporary file generation for wins/recorded results."""
-    json_object = json.dumps(str(gamestate.recorded_events), indent=4)
-    file = open(name, "w", encoding="UTF-8")
-    file.write(json_object)
-    file.close()
+class BookWriter:
+    """
+    Streams simulation books to a shard file as each simulation is imprinted.
+    Compressed shards are written through a zstd stream, so only the current book is held in memory.
+    """
+
+    def __init__(self, filename: str, collect_events: bool = False):
+        self.filename = filename
+        self.collect_events = collect_events
+        self.event_items = {}
+        self.num_books = 0
+        self.regular_json = filename.endswith(".json")
+        if filename.endswith(".zst"):
+            self.file = zstd.ZstdCompressor().stream_writer(open(filename, "wb"))
+        else:
+            self.file = open(filename, "w", encoding="UTF-8")
+        if self.regular_json:
+            self.file.write("[")
+
+    def write_text(self, text: str) -> None:
+        """Write string to the shard file."""
+        if isinstance(self.file, io.TextIOBase):
+            self.file.write(text)
+        else:
+            self.file.write(text.encode("UTF-8"))
+
+    def write(self, book: dict) -> None:
+        """Serialize a single book and append it to the shard."""
+        if self.regular_json:
+            self.write_text((", " if self.num_books > 0 else "") + json.dumps(book))
+        else:
+            self.write_text(json.dumps(book) + "\n")
+        self.num_books += 1
+        if self.collect_events:
+            self.update_event_items(book)
+
+    def update_event_items(self, book: dict) -> None:
+        """Keep the first example of each event type."""
+        for instance in book["events"]:
+            if instance["type"] not in self.event_items:
+                self.event_items[instance["type"]] = {key: val for key, val in instance.items() if key != "index"}
+
+    def close(self) -> None:
+        """Finish the shard file."""
+        if self.regular_json:
+            self.write_text("]")
+        self.file.close()
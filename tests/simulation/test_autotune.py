@@ -0,0 +1,48 @@
+"""Test choice of threads and batch sizes from measured simulation cost."""
+
+from src.state.autotune import AUTO, MIN_AUTO_BATCH_SIZE, choose_run_settings, round_batch_size
+
+MB = 2**20
+MODE_COSTS = {
+    "base": {"seconds_per_sim": 0.001, "retained_memory": 1000, "peak_memory": MB},
+    "bonus": {"seconds_per_sim": 0.05, "retained_memory": 20000, "peak_memory": 10 * MB},
+}
+
+
+def test_round_batch_size():
+    """Batch sizes are rounded down to 1, 2 or 5 times a power of ten within the allowed range."""
+    assert round_batch_size(20000) == 20000
+    assert round_batch_size(19999) == 10000
+    assert round_batch_size(730) == 500
+    assert round_batch_size(3) == MIN_AUTO_BATCH_SIZE
+    assert round_batch_size(1e9) == 100000
+
+
+def test_threads_limited_by_cpus():
+    """With ample memory every cpu runs a worker and shards take about the target time."""
+    threads, batch_sizes = choose_run_settings(MODE_COSTS, 64 * MB, num_cpus=8, available_memory=64 * 1024 * MB)
+    assert threads == 8
+    assert batch_sizes == {"base": 20000, "bonus": 200}
+
+
+def test_threads_and_batches_limited_by_memory():
+    """Little memory reduces the number of workers and the batch size of modes with large books."""
+    threads, batch_sizes = choose_run_settings(MODE_COSTS, 64 * MB, num_cpus=64, available_memory=1024 * MB)
+    assert threads == 10
+    assert batch_sizes == {"base": 10000, "bonus": 100}
+    threads, batch_sizes = choose_run_settings(
+        {"base": {"seconds_per_sim": 1e-5, "retained_memory": 10000, "peak_memory": MB}},
+        64 * MB,
+        num_cpus=4,
+        available_memory=1024 * MB,
+    )
+    assert threads == 4
+    assert batch_sizes["base"] == 10000
+
+
+def test_fixed_settings_kept():
+    """Only settings passed as auto are tuned."""
+    threads, batch_sizes = choose_run_settings(MODE_COSTS, 64 * MB, 8, 64 * 1024 * MB, threads=3, batch_size=AUTO)
+    assert threads == 3
+    threads, batch_sizes = choose_run_settings(MODE_COSTS, 64 * MB, 8, None, threads=AUTO, batch_size=1234)
+    assert threads == 8 and batch_sizes == {"base": 1234, "bonus": 1234}
@@ -0,0 +1,246 @@
+"""Test streamed book output matches one-shot serialization."""
+
+import os
+import json
+import zstandard as zstd
+import pytest
+from src.write_data.write_data import (
+    BookIds,
+    BookWriter,
+    ForceDescriptions,
+    ShardMerger,
+    concatenate_zstd_frames,
+    encode_book_ids,
+    pack_recorded_events,
+    pack_text,
+    unpack_recorded_events,
+    verify_books_stream,
+)
+
+
+def sample_books(num_books: int = 5) -> list:
+    """Minimal books with events."""
+    return [
+        {
+            "id": idx + 1,
+            "payoutMultiplier": idx * 10,
+            "events": [{"index": 0, "type": "reveal", "board": [[{"name": "L1"}]]}],
+            "criteria": "basegame",
+            "baseGameWins": idx * 0.1,
+            "freeGameWins": 0.0,
+        }
+        for idx in range(num_books)
+    ]
+
+
+@pytest.mark.parametrize("num_books", [0, 1, 5])
+def test_jsonl_compressed(tmp_path, num_books):
+    """Compressed shard decodes to newline separated books."""
+    books = sample_books(num_books)
+    filename = str(tmp_path / "books.jsonl.zst")
+    writer = BookWriter(filename)
+    for book in books:
+        writer.write(book)
+    writer.close()
+
+    with open(filename, "rb") as f, zstd.ZstdDecompressor().stream_reader(f) as reader:
+        data = reader.read().decode("UTF-8")
+    assert data == "".join(json.dumps(book) + "\n" for book in books)
+
+
+@pytest.mark.parametrize("num_books", [0, 1, 5])
+def test_regular_json(tmp_path, num_books):
+    """Uncompressed .json shard is a single JSON list."""
+    books = sample_books(num_books)
+    filename = str(tmp_path / "books.json")
+    writer = BookWriter(filename)
+    for book in books:
+        writer.write(book)
+    writer.close()
+
+    with open(filename, "r", encoding="UTF-8") as f:
+        assert f.read() == json.dumps(books)
+
+
+def test_event_items_first_example(tmp_path):
+    """Only the first instance of each event type is kept, without its index."""
+    writer = BookWriter(str(tmp_path / "books.jsonl"), collect_events=True)
+    for book in sample_books(3):
+        writer.write(book)
+    writer.close()
+    assert writer.event_items == {"reveal": {"type": "reveal", "board": [[{"name": "L1"}]]}}
+
+
+def test_concatenated_shards_decode_as_one_stream(tmp_path):
+    """Shard frames joined byte-for-byte decode to all books in shard order."""
+    books = sample_books(7)
+    shard_files = []
+    for shard, shard_books in enumerate([books[:3], books[3:3], books[3:]]):
+        filename = str(tmp_path / f"books_{shard}.jsonl.zst")
+        writer = BookWriter(filename)
+        for book in shard_books:
+            writer.write(book)
+        writer.close()
+        shard_files.append(filename)
+
+    output_file = str(tmp_path / "books.jsonl.zst")
+    with open(output_file, "wb") as out:
+        concatenate_zstd_frames(shard_files, out)
+    assert verify_books_stream(output_file) == len(books)
+
+    with open(output_file, "rb") as f, zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+        assert reader.read().decode("UTF-8") == "".join(json.dumps(book) + "\n" for book in books)
+
+
+class ShardOutputFiles:
+    """Minimal OutputFiles layout in a temporary directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.force_path = str(path)
+        self.config_path = str(path)
+
+    def get_temp_multi_thread_name(self, betmode, shard_index, compress):
+        return str(self.path / f"books_{betmode}_{shard_index}.jsonl{'.zst' if compress else ''}")
+
+    def get_final_book_name(self, betmode, compress):
+        return str(self.path / f"books_{betmode}.jsonl{'.zst' if compress else ''}")
+
+    def get_final_lookup_name(self, betmode):
+        return str(self.path / f"lookUpTable_{betmode}.csv")
+
+    def get_optimized_lookup_name(self, betmode):
+        return str(self.path / f"lookUpTable_{betmode}_0.csv")
+
+    def get_final_segmented_name(self, betmode):
+        return str(self.path / f"lookUpTableSegmented_{betmode}.csv")
+
+
+def test_shard_merger_merges_out_of_order_shards_in_order(tmp_path):
+    """Shards finishing out of order are merged in shard order, as soon as their predecessors are merged."""
+    output_files = ShardOutputFiles(tmp_path)
+    books = sample_books(6)
+    for shard in range(3):
+        writer = BookWriter(output_files.get_temp_multi_thread_name("base", shard, True))
+        for book in books[2 * shard : 2 * shard + 2]:
+            writer.write(book)
+        writer.close()
+
+    def shard_result(shard):
+        lookup_rows = "".join(
+            f"{book['id']},1,{book['payoutMultiplier']}\n" for book in books[2 * shard : 2 * shard + 2]
+        )
+        return {
+            "lookup": pack_text(lookup_rows),
+            "segmented": pack_text(f"segment{shard}\n"),
+            **pack_recorded_events({}),
+        }
+
+    merger = ShardMerger("test", "base", output_files, num_shards=3, compress=True)
+    merger.add_shard(2, shard_result(2))
+    assert merger.next_shard == 0
+    merger.add_shard(0, shard_result(0))
+    assert merger.next_shard == 1
+    merger.add_shard(1, shard_result(1))
+    assert merger.is_complete()
+    merger.finalize()
+
+    with open(output_files.get_final_book_name("base", True), "rb") as f:
+        with zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+            assert [json.loads(line)["id"] for line in reader.read().decode("UTF-8").splitlines()] == [1, 2, 3, 4, 5, 6]
+    with open(output_files.get_final_segmented_name("base"), "r", encoding="UTF-8") as f:
+        assert f.read() == "segment0\nsegment1\nsegment2\n"
+
+
+def test_shard_payload_restores_recorded_events_and_first_event_examples(tmp_path):
+    """Force records survive the payload round trip, event examples are kept from the earliest shard."""
+    output_files = ShardOutputFiles(tmp_path)
+    recorded_events = [
+        {(("kind", 3), ("symbol", "H1")): {"timesTriggered": 1, "bookIds": BookIds([1])}},
+        {
+            (("kind", 3), ("symbol", "H1")): {"timesTriggered": 2, "bookIds": BookIds([2, 3])},
+            (("kind", 4), ("symbol", "H2")): {"timesTriggered": 1, "bookIds": BookIds([2**40])},
+        },
+    ]
+    assert unpack_recorded_events(pack_recorded_events(recorded_events[1])) == recorded_events[1]
+    for shard in range(2):
+        BookWriter(output_files.get_temp_multi_thread_name("base", shard, True)).close()
+
+    merger = ShardMerger("test", "base", output_files, num_shards=2, compress=True, write_event_list=True)
+    for shard in (1, 0):
+        merger.add_shard(
+            shard,
+            {
+                "lookup": pack_text(""),
+                "segmented": pack_text(""),
+                **pack_recorded_events(recorded_events[shard]),
+                "events": {"reveal": {"type": "reveal", "shard": shard}, f"win{shard}": {"type": f"win{shard}"}},
+            },
+        )
+    merger.finalize()
+
+    with open(tmp_path / "force_record_base.json", "r", encoding="UTF-8") as f:
+        force_record = json.load(f)
+    assert [(record["timesTriggered"], record["bookIds"]) for record in force_record] == [
+        (3, [1, 2, 3]),
+        (1, [2**40]),
+    ]
+    with open(tmp_path / "event_config_base.json", "r", encoding="UTF-8") as f:
+        assert json.load(f) == {
+            "reveal": {"type": "reveal", "shard": 0},
+            "win0": {"type": "win0"},
+            "win1": {"type": "win1"},
+        }
+
+
+def test_force_options_written_separately_from_finalize(tmp_path):
+    """A mode finalized early only adds its force options to force.json once they are written."""
+    output_files = ShardOutputFiles(tmp_path)
+    mergers = {}
+    for betmode in ("base", "bonus"):
+        BookWriter(output_files.get_temp_multi_thread_name(betmode, 0, True)).close()
+        recorded_events = {(("kind", 3), ("symbol", betmode)): {"timesTriggered": 1, "bookIds": BookIds([1])}}
+        mergers[betmode] = ShardMerger("test", betmode, output_files, num_shards=1, compress=True)
+        mergers[betmode].add_shard(
+            0, {"lookup": pack_text(""), "segmented": pack_text(""), **pack_recorded_events(recorded_events)}
+        )
+    mergers["bonus"].finalize(write_force_options=False)
+    assert mergers["bonus"].is_finalized and os.path.isfile(tmp_path / "force_record_bonus.json")
+    assert not os.path.isfile(tmp_path / "force.json")
+    mergers["base"].finalize(write_force_options=False)
+    for betmode in ("base", "bonus"):
+        mergers[betmode].write_force_options()
+    with open(tmp_path / "force.json", "r", encoding="UTF-8") as f:
+        assert list(json.load(f)) == ["base", "bonus"]
+
+
+def test_book_ids_skip_repeated_ids():
+    """Repeats of the latest or an earlier id are rejected, new ids keep their order."""
+    book_ids = BookIds([5])
+    assert book_ids.add(5) is False
+    assert book_ids.add(7) is True
+    assert book_ids.add(6) is True
+    assert book_ids.add(5) is False
+    assert book_ids.add(7) is False
+    assert book_ids == [5, 7, 6]
+    assert json.dumps({"bookIds": book_ids}, default=encode_book_ids) == '{"bookIds": [5, 7, 6]}'
+
+    assert book_ids.add(8) is True
+    book_ids.extend(BookIds([10, 9]))
+    assert [book_ids.add(book_id) for book_id in (8, 9, 10, 11, 9)] == [False, False, False, True, False]
+    assert book_ids == [5, 7, 6, 8, 10, 9, 11]
+
+
+def test_force_descriptions_share_ids_by_string_form():
+    """Reordered keys share an id, values with equal hashes but different strings do not."""
+    descriptions = ForceDescriptions()
+    line_win = descriptions.get_id({"kind": 3, "symbol": "L5", "mult": 1, "gametype": "basegame"})
+    assert descriptions.get_id({"gametype": "basegame", "symbol": "L5", "kind": 3, "mult": 1}) == line_win
+    assert descriptions.get_id({"kind": 3, "symbol": "L5", "mult": 1.0, "gametype": "basegame"}) != line_win
+    assert descriptions.get_id({"kind": 3, "symbol": ["L5"], "mult": 1, "gametype": "basegame"}) != line_win
+    assert descriptions.get_description(line_win) == (
+        ("gametype", "basegame"),
+        ("kind", "3"),
+        ("mult", "1"),
+        ("symbol", "L5"),
+    )
@@ -0,0 +1,25 @@
+"""Test books take ownership of events and detect events changed after they were added."""
+
+import pytest
+from src.state.books import Book
+
+
+def test_add_event_keeps_the_event_without_copying():
+    """Events are stored as given."""
+    book = Book(1, "basegame")
+    event = {"index": 0, "type": "reveal", "board": [[{"name": "L1"}]]}
+    book.add_event(event)
+    assert book.to_json()["events"][0] is event
+
+
+def test_check_events_detects_modified_events():
+    """Changes through append_book_items are allowed, changes to a shared container raise."""
+    board = [[{"name": "L1"}]]
+    book = Book(1, "basegame", check_events=True)
+    book.add_event({"index": 0, "type": "reveal", "board": board})
+    book.append_book_items(0, {"gameType": "basegame"})
+    assert book.to_json()["events"][0]["gameType"] == "basegame"
+
+    board[0][0]["name"] = "H1"
+    with pytest.raises(RuntimeError, match="Event 0 \\(reveal\\) of book 1 was modified"):
+        book.to_json()
@@ -0,0 +1,62 @@
+"""Test validation of shard files simulated on separate machines."""
+
+import json
+import os
+import pytest
+from src.state.distributed import SHARD_METADATA_SUFFIX, load_shard_metadata, verify_mode_shards
+from src.write_data.write_data import get_sha_256
+
+
+def write_shard(shard_dir, sim_range: list, fingerprint: str = "abc") -> None:
+    """Shard with a single lookup file and its metadata."""
+    label = f"{sim_range[0]}-{sim_range[1]}"
+    lookup_name = f"lookUpTable_base_{label}"
+    with open(os.path.join(shard_dir, lookup_name), "w", encoding="UTF-8") as f:
+        f.write("".join(f"{sim + 1},1,0\n" for sim in range(*sim_range)))
+    metadata = {
+        "game_id": "test",
+        "betmode": "base",
+        "num_sims": 10,
+        "sim_range": sim_range,
+        "compress": True,
+        "fingerprint": fingerprint,
+        "force_keys": [],
+        "files": {"lookup": {"name": lookup_name, "sha256": get_sha_256(os.path.join(shard_dir, lookup_name))}},
+    }
+    with open(os.path.join(shard_dir, f"base_{label}{SHARD_METADATA_SUFFIX}"), "w", encoding="UTF-8") as f:
+        json.dump(metadata, f)
+
+
+def test_shards_ordered_by_sim_range(tmp_path):
+    """Shards are merged in simulation order, not file name order."""
+    for sim_range in ([5, 10], [0, 2], [2, 5]):
+        write_shard(tmp_path, sim_range)
+    shards = load_shard_metadata(tmp_path)
+    assert [metadata["sim_range"] for metadata in shards["base"]] == [[0, 2], [2, 5], [5, 10]]
+    verify_mode_shards(shards["base"], tmp_path)
+
+
+def test_missing_sims_rejected(tmp_path):
+    """Shards must cover every simulation in the mode."""
+    for sim_range in ([0, 2], [5, 10]):
+        write_shard(tmp_path, sim_range)
+    with pytest.raises(RuntimeError):
+        verify_mode_shards(load_shard_metadata(tmp_path)["base"], tmp_path)
+
+
+def test_mismatched_inputs_rejected(tmp_path):
+    """Shards simulated with different game inputs cannot be merged."""
+    write_shard(tmp_path, [0, 5])
+    write_shard(tmp_path, [5, 10], fingerprint="def")
+    with pytest.raises(RuntimeError):
+        verify_mode_shards(load_shard_metadata(tmp_path)["base"], tmp_path)
+
+
+def test_modified_shard_rejected(tmp_path):
+    """Shard files altered after simulation fail their hash check."""
+    for sim_range in ([0, 5], [5, 10]):
+        write_shard(tmp_path, sim_range)
+    with open(os.path.join(tmp_path, "lookUpTable_base_0-5"), "a", encoding="UTF-8") as f:
+        f.write("99,1,0\n")
+    with pytest.raises(RuntimeError):
+        verify_mode_shards(load_shard_metadata(tmp_path)["base"], tmp_path)
@@ -0,0 +1,46 @@
+"""Test projection of a full run from sampled criteria."""
+
+from src.state.dry_run import format_bytes, format_seconds, project_run
+
+
+def make_sample(seconds: float, attempts: float, book_bytes: float, retained: float, peak: float) -> dict:
+    """Sampled measurements of a single criteria."""
+    return {
+        "seconds_per_sim": seconds,
+        "attempts_per_sim": attempts,
+        "book_bytes": book_bytes,
+        "compressed_book_bytes": book_bytes / 10,
+        "lookup_bytes": 10,
+        "segmented_bytes": 20,
+        "peak_memory": peak,
+        "retained_memory": retained,
+    }
+
+
+def test_project_run_scales_samples_by_criteria_counts():
+    """Totals weight every criteria by its number of sims, wall time is split over the usable cpus."""
+    samples = {
+        "base": {
+            "basegame": make_sample(0.001, 2.0, 1000, 100, 5000),
+            "wincap": make_sample(0.1, 20.0, 20000, 1000, 90000),
+        }
+    }
+    counts = {"base": {"basegame": 900, "wincap": 100}}
+    estimate = project_run(samples, counts, threads=8, shard_size=50, compress=True, num_cpus=4)
+
+    mode = estimate["modes"]["base"]
+    assert mode["sims"] == 1000
+    assert mode["repeats_per_sim"] == (900 * 2.0 + 100 * 20.0 - 1000) / 1000
+    assert abs(estimate["cpu_seconds"] - 10.9) < 1e-9
+    assert abs(estimate["wall_seconds"] - 10.9 / 4) < 1e-9
+    assert estimate["disk_bytes"] == 900 * 100 + 100 * 2000 + 1000 * 40
+    assert estimate["peak_disk_bytes"] == estimate["disk_bytes"] + 900 * 100 + 100 * 2000
+    assert estimate["worker_memory"] == 90000 + 50 * 190
+    assert estimate["ram_bytes"] == 8 * estimate["worker_memory"] + 1000
+
+
+def test_formatting():
+    """Sizes and durations are reported in readable units."""
+    assert format_bytes(512) == "512.0 B"
+    assert format_bytes(3 * 1024**3) == "3.0 GB"
+    assert format_seconds(3725) == "1h 02m 05s"
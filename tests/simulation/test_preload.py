@@ -0,0 +1,88 @@
+"""Test data preloaded before starting workers."""
+
+import random
+from types import SimpleNamespace
+from src.calculations.statistics import get_random_outcome, preload_distribution
+from src.calculations.symbol import SymbolStorage
+from src.config.betmode import BetMode
+from src.config.distributions import Distribution
+from src.state.preload import find_weight_distributions, fresh_gamestate
+from src.state.state import GeneralGameState
+
+
+def test_preloaded_distribution_same_outcomes():
+    """Draws from a preloaded distribution match the linear search for the same random stream."""
+    distribution = {1: 0.1, 2: 3, 5: 0.25, 10: 1e-3, 50: 2}
+    linear_rng, preloaded_rng = random.Random(5), random.Random(5)
+    linear = [get_random_outcome(distribution, rng=linear_rng) for _ in range(2000)]
+    preload_distribution(distribution)
+    assert [get_random_outcome(distribution, rng=preloaded_rng) for _ in range(2000)] == linear
+
+
+def test_find_weight_distributions():
+    """Only non-empty dicts of numeric weights are preloaded."""
+    conditions = {
+        "reel_weights": {"basegame": {"BR0": 1, "BR1": 2}, "freegame": {"FR0": 1}},
+        "force_wincap": False,
+        "scatter_triggers": {4: 1, 5: 2},
+        "flags": {"a": True},
+        "names": ["x", {"empty": {}}],
+    }
+    found = list(find_weight_distributions(conditions))
+    assert found == [{"BR0": 1, "BR1": 2}, {"FR0": 1}, {4: 1, 5: 2}]
+
+
+def test_symbol_prototype_copies():
+    """Symbols copied from a prototype keep their attributes but not registered functions."""
+    config = SimpleNamespace(special_symbols={"wild": ["W"]}, paytable={(3, "H1"): 5, (4, "H1"): 10})
+    storage = SymbolStorage(config, ["W", "H1"])
+    first = storage.create_symbol_state("W")
+    first.register_special_function(lambda symbol: None)
+    first.assign_attribute({"multiplier": 2})
+    second = storage.create_symbol_state("W")
+    assert second.special_functions == [] and not hasattr(second, "multiplier")
+    assert second.check_attribute("wild") and not second.is_paying
+    paying = storage.create_symbol_state("H1")
+    assert paying.is_paying and paying.paytable == [{"3": 5}, {"4": 10}]
+
+
+class ContextState(GeneralGameState):
+    """Gamestate holding only a config, enough to resolve the bet mode context."""
+
+    def __init__(self, config):
+        self.config = config
+        self.symbol_storage = None
+        self.reel_symbol_positions = {}
+        self.current_betmode = None
+        self.current_distribution = None
+        self.distribution_conditions = None
+
+    def assign_special_sym_function(self):
+        pass
+
+    def run_spin(self, sim):
+        pass
+
+    def run_freespin(self):
+        pass
+
+
+def test_bet_context_follows_betmode_and_criteria():
+    """Assigning a bet mode or criteria resolves its distribution once, fresh copies share the config objects."""
+    distributions = [
+        Distribution(criteria=criteria, quota=1, conditions={"reel_weights": {"basegame": {"BR0": 1}}})
+        for criteria in ("freegame", "0")
+    ]
+    betmodes = [BetMode(name, 1.0, 0.97, 5000, False, False, False, distributions) for name in ("base", "bonus")]
+    state = ContextState(SimpleNamespace(bet_modes=betmodes, reels={}, special_symbols={}))
+    state.betmode = "bonus"
+    state.criteria = "0"
+    assert state.get_current_betmode() is betmodes[1] and state.get_betmode("bonus") is betmodes[1]
+    assert state.get_current_betmode_distributions() is distributions[1]
+    assert state.get_current_distribution_conditions() is distributions[1]._conditions
+
+    state_copy = fresh_gamestate(state)
+    state_copy.criteria = "freegame"
+    assert state_copy.get_current_betmode() is betmodes[1]
+    assert state_copy.get_current_distribution_conditions() is distributions[0]._conditions
+    assert state.get_current_betmode_distributions() is distributions[1]
@@ -0,0 +1,60 @@
+"""Test merging of per-process profiles into per-mode reports."""
+
+import os
+from src.state.profiling import ModeProfiler, collapse_stats, get_profile_files, write_profile_reports
+
+
+def inner_loop() -> int:
+    """Spend measurable time in a nested call."""
+    return sum(i * i for i in range(20000))
+
+
+def outer_loop() -> int:
+    """Caller of inner_loop."""
+    return sum(inner_loop() for _ in range(5))
+
+
+def test_mode_profiles_merged_across_processes(tmp_path):
+    """Profiles from several processes are combined into one report per mode."""
+    profile_dir = os.path.join(tmp_path, "profiles")
+    os.makedirs(profile_dir)
+    for process_name in ("worker0", "worker1"):
+        profiler = ModeProfiler(profile_dir, process_name)
+        profiler.runcall("base", outer_loop)
+        profiler.runcall("bonus", inner_loop)
+        profiler.dump()
+
+    report_dir = os.path.join(tmp_path, "reports")
+    write_profile_reports(profile_dir, ["base", "bonus"], report_dir)
+    for betmode in ("base", "bonus"):
+        for ext in (".prof", ".txt", ".collapsed"):
+            assert os.path.isfile(os.path.join(report_dir, f"simulationProfile_{betmode}{ext}"))
+    with open(os.path.join(report_dir, "simulationProfile_base.txt"), "r", encoding="UTF-8") as f:
+        assert "Combined profile of 2 processes" in f.read()
+
+
+def test_profiles_of_modes_sharing_a_prefix_are_kept_apart(tmp_path):
+    """A mode's report does not include profiles of a mode whose name starts with its name."""
+    for process_name in ("main", "worker0", "worker12"):
+        profiler = ModeProfiler(str(tmp_path), process_name)
+        profiler.runcall("bonus", inner_loop)
+        profiler.runcall("bonus_hunt", inner_loop)
+        profiler.dump()
+
+    bonus_files = [os.path.basename(fname) for fname in get_profile_files(str(tmp_path), "bonus")]
+    assert bonus_files == ["bonus_main.prof", "bonus_worker0.prof", "bonus_worker12.prof"]
+    assert len(get_profile_files(str(tmp_path), "bonus_hunt")) == 3
+
+
+def test_collapsed_stacks_follow_call_edges(tmp_path):
+    """Nested calls appear as ';' separated stacks below their caller."""
+    profiler = ModeProfiler(str(tmp_path), "main")
+    profiler.runcall("base", outer_loop)
+    profiler.profiles["base"].create_stats()
+    stacks = collapse_stats(profiler.profiles["base"].stats)
+    nested = []
+    for stack in stacks:
+        frames = [frame.split(" ")[0] for frame in stack.split(";")]
+        if "outer_loop" in frames and "inner_loop" in frames:
+            nested.append(frames.index("outer_loop") < frames.index("inner_loop"))
+    assert len(nested) > 0 and all(nested)
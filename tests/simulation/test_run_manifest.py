@@ -0,0 +1,107 @@
+"""Test recording and resuming finished simulation shards."""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+from src.state.run_manifest import RunManifest, hash_shard_files
+from src.state.run_sims import get_resumed_shards, get_run_details
+from src.state.sim_allocation import SimAllocation
+
+
+RUN_DETAILS = {"game_id": "test", "compress": True, "modes": {"base": {"shards": [(0, 5), (5, 10)]}}}
+
+
+def write_shard(tmp_path, name: str, content: str) -> dict:
+    """Write a temp shard file and return its shard result."""
+    fname = os.path.join(tmp_path, name)
+    with open(fname, "w", encoding="UTF-8") as f:
+        f.write(content)
+    return {"force_keys": ["symbol"], "files": hash_shard_files([fname])}
+
+
+def test_resume_reuses_recorded_shards(tmp_path):
+    """Shards recorded by an interrupted run are finished on resume."""
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    manifest = RunManifest(manifest_name, RUN_DETAILS)
+    manifest.record(("base", 0), write_shard(tmp_path, "books_base_0", "book"))
+    manifest.close()
+
+    resumed = RunManifest(manifest_name, RUN_DETAILS, resume=True)
+    assert resumed.is_finished(("base", 0))
+    assert not resumed.is_finished(("base", 1))
+    assert resumed.finished[("base", 0)]["force_keys"] == ["symbol"]
+    resumed.close()
+
+
+def test_modified_shard_is_rerun(tmp_path):
+    """Shards whose files no longer match the recorded hash are not reused."""
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    manifest = RunManifest(manifest_name, RUN_DETAILS)
+    manifest.record(("base", 0), write_shard(tmp_path, "books_base_0", "book"))
+    manifest.close()
+    with open(os.path.join(tmp_path, "books_base_0"), "w", encoding="UTF-8") as f:
+        f.write("truncated")
+
+    resumed = RunManifest(manifest_name, RUN_DETAILS, resume=True)
+    assert not resumed.is_finished(("base", 0))
+    resumed.close()
+
+
+def test_partial_manifest_line_is_ignored(tmp_path):
+    """A line cut off by a crash does not prevent resuming earlier shards."""
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    manifest = RunManifest(manifest_name, RUN_DETAILS)
+    manifest.record(("base", 0), write_shard(tmp_path, "books_base_0", "book"))
+    manifest.close()
+    with open(manifest_name, "a", encoding="UTF-8") as f:
+        f.write('{"betmode": "base", "shard": 1, "fo')
+
+    resumed = RunManifest(manifest_name, RUN_DETAILS, resume=True)
+    assert list(resumed.finished) == [("base", 0)]
+    resumed.close()
+
+
+def test_changed_run_details_start_new_run(tmp_path):
+    """A manifest from a different run is discarded."""
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    manifest = RunManifest(manifest_name, RUN_DETAILS)
+    manifest.record(("base", 0), write_shard(tmp_path, "books_base_0", "book"))
+    manifest.close()
+
+    new_details = {**RUN_DETAILS, "compress": False}
+    with pytest.warns(UserWarning):
+        resumed = RunManifest(manifest_name, new_details, resume=True)
+    assert len(resumed.finished) == 0
+    resumed.close()
+
+
+
+@pytest.mark.parametrize("changed", [{"fingerprint": "new"}, {"rng_mode": "compat"}, {"rng_seed": 1}])
+def test_changed_mode_inputs_start_new_run(tmp_path, changed):
+    """A manifest recorded with other mode inputs or rng settings is discarded."""
+    settings = {"game_id": "test", "write_event_list": False, "rng_mode": "philox", "rng_seed": 0, "fingerprint": "old"}
+    mode_plans = {"base": ([(0, 5), (5, 10)], SimAllocation(["basegame"], bytearray(10)))}
+
+    def get_details(settings: dict) -> dict:
+        return get_run_details(SimpleNamespace(**settings), mode_plans, True, {"base": settings["fingerprint"]})
+
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    manifest = RunManifest(manifest_name, get_details(settings))
+    manifest.record(("base", 0), write_shard(tmp_path, "books_base_0", "book"))
+    manifest.close()
+
+    with pytest.warns(UserWarning):
+        resumed = RunManifest(manifest_name, get_details({**settings, **changed}), resume=True)
+    assert len(resumed.finished) == 0
+    resumed.close()
+
+
+def test_resumed_run_keeps_recorded_shards(tmp_path):
+    """Recorded shards are reused for modes they cover exactly, other modes are planned again."""
+    manifest_name = os.path.join(tmp_path, "run_manifest.jsonl")
+    run_details = {**RUN_DETAILS, "modes": {**RUN_DETAILS["modes"], "bonus": {"shards": [(0, 4), (4, 8)]}}}
+    RunManifest(manifest_name, run_details).close()
+    resumed_shards = get_resumed_shards(manifest_name, {"base": 10, "bonus": 7, "super": 3})
+    assert resumed_shards == {"base": [(0, 5), (5, 10)]}
+    assert get_resumed_shards(os.path.join(tmp_path, "missing.jsonl"), {"base": 10}) == {}
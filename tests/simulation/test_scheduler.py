@@ -0,0 +1,75 @@
+"""Test chunk splitting and cost-ordered distribution of simulations."""
+
+from src.state.scheduler import CostOrderedScheduler, partition_sims
+from src.state.run_sims import get_sim_shards, get_sim_tasks
+
+
+def test_partition_sims_balanced():
+    """Shards are contiguous, cover every sim and differ in size by at most one."""
+    shards = partition_sims(10, 4)
+    assert shards == [(0, 3), (3, 6), (6, 8), (8, 10)]
+
+
+def test_partition_more_shards_than_sims():
+    """Shard count is capped so no shard is empty."""
+    assert partition_sims(3, 8) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_sim_shards_for_any_sim_count():
+    """Sim counts with no common factor with the batch size are fully covered."""
+    shards = get_sim_shards(100_003, batching_size=1000)
+    assert shards[0][0] == 0 and shards[-1][1] == 100_003
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(shards, shards[1:]))
+    assert max(end - start for start, end in shards) <= 1000
+    assert len(shards) == 101
+
+
+def test_sim_shards_bounded_by_workers():
+    """Small modes get one shard per worker, without empty shards or extra shards beyond the batch count."""
+    assert get_sim_shards(1000, batching_size=1000, num_workers=4) == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+    assert get_sim_shards(3, batching_size=1000, num_workers=4) == [(0, 1), (1, 2), (2, 3)]
+    assert len(get_sim_shards(10_000, batching_size=1000, num_workers=4)) == 10
+
+
+def test_chunks_handed_out_once():
+    """Every chunk is returned exactly once across all workers."""
+    scheduler = CostOrderedScheduler(num_chunks=23, num_workers=4)
+    handed_out = []
+    worker = 0
+    while True:
+        chunk = scheduler.next_chunk(worker)
+        if chunk is None:
+            break
+        handed_out.append(chunk)
+        worker = (worker + 1) % 4
+    assert sorted(handed_out) == list(range(23))
+
+
+def test_expensive_chunks_first():
+    """Chunks are handed out by decreasing cost, ties in index order, and can be reordered during the run."""
+    scheduler = CostOrderedScheduler(num_chunks=6, num_workers=2, costs=[1, 5, 1, 3, 5, 1])
+    assert [scheduler.next_chunk(0), scheduler.next_chunk(1)] == [1, 4]
+    scheduler.reorder([1, 5, 2, 3, 5, 9])
+    assert [scheduler.next_chunk(worker % 2) for worker in range(5)] == [5, 3, 2, 0, None]
+
+
+def test_sim_tasks_cover_all_modes():
+    """Tasks from every mode share one queue, ordered by mode and then shard."""
+    mode_plans = {"base": ([(0, 5), (5, 10)], {}), "bonus": ([(0, 3)], {})}
+    assert get_sim_tasks(mode_plans) == [("base", 0), ("base", 1), ("bonus", 0)]
+
+
+def test_retired_workers_get_no_chunks():
+    """Workers above the limit get no further chunks, the remaining workers take every other chunk."""
+    scheduler = CostOrderedScheduler(num_chunks=12, num_workers=3)
+    assert scheduler.next_chunk(2) == 0
+    scheduler.limit_workers(2)
+    assert scheduler.next_chunk(2) is None
+    handed_out = [0]
+    for worker in (0, 1) * 6:
+        chunk = scheduler.next_chunk(worker)
+        if chunk is not None:
+            handed_out.append(chunk)
+    assert handed_out == list(range(12))
+    scheduler.limit_workers(0)
+    assert scheduler.get_worker_limit() == 1
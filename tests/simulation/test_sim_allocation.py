@@ -0,0 +1,44 @@
+"""Test the compact criteria allocation."""
+
+import random
+from multiprocessing import Process, Queue
+from src.state.run_sims import assign_sim_criteria
+
+
+def test_same_assignment_as_shuffled_list():
+    """Shuffling criteria indices assigns the same criteria as shuffling a list of criteria names."""
+    counts = {"0": 40, "basegame": 45, "freegame": 14, "wincap": 1}
+    random.seed(0)
+    allocation = assign_sim_criteria(counts, 100)
+    random.seed(0)
+    expected = [criteria for criteria, count in counts.items() for _ in range(count)]
+    random.shuffle(expected)
+    assert len(allocation) == 100
+    assert [allocation[sim] for sim in range(100)] == expected
+
+
+def test_used_criteria_and_digest():
+    """Only allocated criteria are reported, and the digest changes with the assignment."""
+    random.seed(0)
+    allocation = assign_sim_criteria({"basegame": 10, "wincap": 0, "freegame": 5}, 15)
+    assert allocation.get_used_criteria() == ["basegame", "freegame"]
+    random.seed(1)
+    reshuffled = assign_sim_criteria({"basegame": 10, "wincap": 0, "freegame": 5}, 15)
+    assert allocation.get_digest() != reshuffled.get_digest()
+
+
+def read_allocation(allocation, result_queue):
+    """Send back the criteria a worker sees."""
+    result_queue.put([allocation[sim] for sim in range(len(allocation))])
+
+
+def test_shared_with_workers():
+    """Worker processes read the allocation made by the parent."""
+    random.seed(0)
+    allocation = assign_sim_criteria({"basegame": 30, "freegame": 20}, 50)
+    result_queue = Queue()
+    process = Process(target=read_allocation, args=(allocation, result_queue))
+    process.start()
+    worker_view = result_queue.get(timeout=30)
+    process.join()
+    assert worker_view == [allocation[sim] for sim in range(50)]
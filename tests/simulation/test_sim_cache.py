@@ -0,0 +1,78 @@
+"""Test input fingerprints and reuse of previously simulated modes."""
+
+import os
+from types import SimpleNamespace
+import src.config.output_filenames as output_filenames
+from src.config.betmode import BetMode
+from src.config.distributions import Distribution
+from src.state.sim_cache import SimCache, describe_value, get_mode_fingerprint
+
+
+def sample_config(base_reel: list, bonus_reel: list) -> SimpleNamespace:
+    """Two modes, each referencing a single reelstrip."""
+    bet_modes = [
+        BetMode(
+            name=name,
+            cost=1.0,
+            rtp=0.97,
+            max_win=5000,
+            auto_close_disabled=False,
+            is_feature=True,
+            is_buybonus=False,
+            distributions=[
+                Distribution(criteria="basegame", quota=1, conditions={"reel_weights": {"basegame": {reel: 1}}})
+            ],
+        )
+        for name, reel in (("base", "BR0"), ("bonus", "FR0"))
+    ]
+    return SimpleNamespace(paytable={(5, "H1"): 10}, bet_modes=bet_modes, reels={"BR0": base_reel, "FR0": bonus_reel})
+
+
+def test_describe_sets_independent_of_order():
+    """Set descriptions are sorted, so fingerprints do not depend on hash seeds."""
+    assert describe_value({"b", "a", "c"}) == describe_value({"c", "b", "a"})
+
+
+def test_fingerprint_only_tracks_referenced_reels():
+    """Changing the bonus reelstrip only changes the bonus fingerprint."""
+    config = sample_config([["H1", "L1"]], [["H1", "H1"]])
+    changed = sample_config([["H1", "L1"]], [["L1", "L1"]])
+    assert get_mode_fingerprint(config, "base", 100, True, "src") == get_mode_fingerprint(
+        changed, "base", 100, True, "src"
+    )
+    assert get_mode_fingerprint(config, "bonus", 100, True, "src") != get_mode_fingerprint(
+        changed, "bonus", 100, True, "src"
+    )
+
+
+def test_fingerprint_tracks_sims_and_sources():
+    """Sim count and source changes invalidate a mode."""
+    config = sample_config([["H1", "L1"]], [["H1", "H1"]])
+    fingerprint = get_mode_fingerprint(config, "base", 100, True, "src")
+    assert fingerprint != get_mode_fingerprint(config, "base", 200, True, "src")
+    assert fingerprint != get_mode_fingerprint(config, "base", 100, True, "edited_src")
+
+
+def test_cache_rejects_modified_outputs(tmp_path):
+    """Outputs modified after they were recorded are not reused."""
+    output_file = os.path.join(tmp_path, "lookUpTable_base.csv")
+    with open(output_file, "w", encoding="UTF-8") as f:
+        f.write("1,1,0\n")
+    cache = SimCache(os.path.join(tmp_path, "sim_cache.json"))
+    cache.update("base", "abc", [output_file], ["key"])
+    cache.save()
+
+    cache = SimCache(os.path.join(tmp_path, "sim_cache.json"))
+    assert cache.get_cached_force_keys("base", "abc", [output_file]) == ["key"]
+    assert cache.get_cached_force_keys("base", "def", [output_file]) is None
+    with open(output_file, "w", encoding="UTF-8") as f:
+        f.write("1,1,100\n")
+    assert cache.get_cached_force_keys("base", "abc", [output_file]) is None
+
+
+def test_output_directories_leave_out_temp_directory(tmp_path, monkeypatch):
+    """The temp shard directory is only created for modes which are simulated, not for a fully cached run."""
+    monkeypatch.setattr(output_filenames, "PATH_TO_GAMES", str(tmp_path))
+    output_files = output_filenames.OutputFiles(SimpleNamespace(game_id="test", bet_modes=[], output_regular_json=False))
+    assert os.path.isdir(output_files.library_path) and os.path.isdir(output_files.force_path)
+    assert not os.path.exists(output_files.temp_path)
@@ -0,0 +1,41 @@
+"""Test columnar sim results format the same rows as a library of book dicts."""
+
+from src.state.sim_results import SimResults
+
+
+def library_rows(books: list) -> tuple:
+    """Lookup and pay split rows as formatted from a library keyed by book id."""
+    library = {book["id"]: book for book in books}
+    lookup = "".join(
+        "{},1,{}\n".format(library[sim]["id"], library[sim]["payoutMultiplier"]) for sim in sorted(library)
+    )
+    pay_split = "".join(
+        f"{library[sim]['id']},{library[sim]['criteria']},"
+        f"{round(library[sim]['baseGameWins'], 2)},{round(library[sim]['freeGameWins'], 2)}\n"
+        for sim in sorted(library)
+    )
+    return lookup, pay_split
+
+
+def test_rows_match_library_rows():
+    """Rows are in book id order, a repeated id keeps its last result and int wins print without decimals."""
+    books = [
+        {"id": 3, "payoutMultiplier": 20, "baseGameWins": 0.2, "freeGameWins": 0.0, "criteria": "basegame"},
+        {"id": 1, "payoutMultiplier": 500000, "baseGameWins": 5000, "freeGameWins": 0.0, "criteria": "wincap"},
+        {"id": 2, "payoutMultiplier": 30, "baseGameWins": 0.1 + 0.2, "freeGameWins": 0.0, "criteria": "0"},
+        {"id": 3, "payoutMultiplier": 140, "baseGameWins": 0.0, "freeGameWins": 1.4, "criteria": "freegame"},
+    ]
+    sim_results = SimResults()
+    for book in books:
+        sim_results.add(
+            book["id"], book["payoutMultiplier"], book["baseGameWins"], book["freeGameWins"], book["criteria"], 0
+        )
+    assert (sim_results.get_lookup_rows(), sim_results.get_pay_split_rows()) == library_rows(books)
+    assert sim_results.criteria == ["basegame", "wincap", "0", "freegame"]
+
+
+def test_empty_results_have_no_rows():
+    """A shard without finished sims formats no rows."""
+    sim_results = SimResults()
+    assert len(sim_results) == 0
+    assert sim_results.get_lookup_rows() == "" and sim_results.get_pay_split_rows() == ""
@@ -0,0 +1,58 @@
+"""Test claiming and resolving speculative attempts of a repeated simulation."""
+
+from src.state.speculation import SpeculationBoard
+
+
+def test_lowest_success_after_lower_attempts_finish():
+    """A later success only resolves the sim once every lower attempt has failed."""
+    board = SpeculationBoard(2, ["base"])
+    owner, helper = board.for_worker(0), board.for_worker(1)
+    episode = owner.post("base", 17, 3)
+    assert helper.find_open_slot() == (0, episode, "base", 17)
+    assert helper.claim(0, episode) == 3
+    assert owner.claim(0, episode) == 4
+    owner.report_success()
+    assert not owner.is_resolved(0, episode)
+    assert helper.claim(0, episode) is None
+    assert owner.is_resolved(0, episode)
+    assert owner.close(0) == 4
+
+
+def test_lower_success_wins():
+    """A success from a lower attempt replaces a higher one, and no further attempts are handed out."""
+    board = SpeculationBoard(2, ["base", "bonus"])
+    owner, helper = board.for_worker(0), board.for_worker(1)
+    episode = owner.post("bonus", 5, 10)
+    assert helper.claim(0, episode) == 10
+    assert owner.claim(0, episode) == 11
+    owner.report_success()
+    helper.report_success()
+    assert owner.claim(0, episode) is None
+    assert helper.find_open_slot() is None
+    assert owner.is_resolved(0, episode)
+    assert owner.close(0) == 10
+
+
+def test_stale_episode_ignored():
+    """Results for a sim which is no longer posted do not affect the next sim in the same slot."""
+    board = SpeculationBoard(2, ["base"])
+    owner, helper = board.for_worker(0), board.for_worker(1)
+    first_episode = owner.post("base", 1, 2)
+    assert helper.claim(0, first_episode) == 2
+    owner.close(0)
+    second_episode = owner.post("base", 2, 2)
+    helper.report_success()
+    assert helper.claim(0, first_episode) is None
+    assert owner.claim(0, second_episode) == 2
+    owner.report_success()
+    assert owner.is_resolved(0, second_episode)
+    assert owner.close(0) == 2
+
+
+def test_busy_workers():
+    """Helpers keep running until every worker has finished its shards."""
+    board = SpeculationBoard(2, ["base"])
+    board.for_worker(0).worker_done()
+    assert board.has_busy_workers()
+    board.for_worker(1).worker_done()
+    assert not board.has_busy_workers()
@@ -0,0 +1,53 @@
+"""Test shard cost estimates used to run expensive modes first."""
+
+import os
+from src.state.scheduler import CostOrderedScheduler
+from src.state.sim_allocation import SimAllocation
+from src.state.task_costs import MIN_LIVE_SIMS, TaskCosts, load_criteria_costs, save_criteria_costs
+
+
+def make_mode_plans() -> dict:
+    """One mode of three shards, the last shard holds both wincap sims."""
+    allocation = SimAllocation(["0", "basegame", "wincap"], bytearray([0, 1, 0, 1, 0, 1, 0, 2, 2]))
+    return {"base": ([(0, 3), (3, 6), (6, 9)], allocation)}
+
+
+def test_criteria_counts_of_shards():
+    """Shard criteria counts come from the shared allocation."""
+    allocation = make_mode_plans()["base"][1]
+    assert allocation.get_criteria_counts(0, 3) == [2, 1, 0]
+    assert allocation.get_criteria_counts(6, 9) == [1, 0, 2]
+
+
+def test_task_costs_from_previous_and_live_costs():
+    """Shard costs weight criteria counts by recorded costs, live measurements replace them once reliable."""
+    tasks = [("base", 0), ("base", 1), ("base", 2)]
+    task_costs = TaskCosts(tasks, make_mode_plans(), {"base:0": 1.0, "base:wincap": 100.0})
+    # basegame is unknown, so it costs the average of known criteria
+    assert task_costs.get_costs() == [2 * 1.0 + 50.5, 1.0 + 2 * 50.5, 1.0 + 2 * 100.0]
+
+    task_costs.update({"base:0": (MIN_LIVE_SIMS - 1, 1000.0), "base:basegame": (MIN_LIVE_SIMS, 2.0 * MIN_LIVE_SIMS)})
+    assert task_costs.get_costs() == [2 * 1.0 + 2.0, 1.0 + 2 * 2.0, 1.0 + 2 * 100.0]
+
+
+def test_criteria_costs_saved_for_next_run(tmp_path):
+    """Measured costs are merged into the recorded costs, criteria without finished sims keep their cost."""
+    filename = os.path.join(tmp_path, "criteria_costs.json")
+    assert load_criteria_costs(filename) == {}
+    save_criteria_costs(filename, {"base:0": (10, 1.0), "base:wincap": (2, 8.0)})
+    save_criteria_costs(filename, {"base:0": (10, 2.0), "base:wincap": (0, 0.0)})
+    assert load_criteria_costs(filename) == {"base:0": 0.2, "base:wincap": 4.0}
+
+
+def test_expensive_mode_first_in_shard_order():
+    """Tasks of the most expensive mode are handed out first, the shards of each mode stay in shard order."""
+    base_allocation = SimAllocation(["0", "basegame"], bytearray([0, 1, 0, 1]))
+    mode_plans = {"base": ([(0, 2), (2, 4)], base_allocation), "bonus": make_mode_plans()["base"]}
+    tasks = [("base", 0), ("base", 1), ("bonus", 0), ("bonus", 1), ("bonus", 2)]
+    task_costs = TaskCosts(tasks, mode_plans, {"base:0": 1.0, "base:basegame": 1.0, "bonus:wincap": 100.0})
+    priorities = task_costs.get_mode_priorities()
+    assert priorities[:2] == [4.0, 4.0] and len(set(priorities[2:])) == 1 and priorities[2] > 4.0
+
+    scheduler = CostOrderedScheduler(len(tasks), 1, costs=priorities)
+    handed_out = [tasks[scheduler.next_chunk(0)] for _ in tasks]
+    assert handed_out == [("bonus", 0), ("bonus", 1), ("bonus", 2), ("base", 0), ("base", 1)]
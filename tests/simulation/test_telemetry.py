@@ -0,0 +1,46 @@
+"""Test shared-memory simulation counters and progress metrics."""
+
+import json
+import os
+from src.state.telemetry import ProgressReporter, SimCounters
+
+
+def test_counters_separate_workers_and_criteria():
+    """Each worker writes its own slots, criteria totals are summed over workers."""
+    counters = SimCounters(2, [("base", "0"), ("base", "freegame")])
+    counters.for_worker(0).record_sim("base", "0", attempts=1)
+    counters.for_worker(1).record_sim("base", "freegame", attempts=3)
+    counters.for_worker(1).record_sim("base", "0", attempts=2)
+
+    assert counters.get_worker_totals() == [(1, 0), (2, 3)]
+    assert counters.get_criteria_totals() == {
+        "base:0": {"accepted": 2, "rejected": 1},
+        "base:freegame": {"accepted": 1, "rejected": 2},
+    }
+
+
+def test_criteria_seconds():
+    """Time spent on each criteria is summed over workers."""
+    counters = SimCounters(2, [("base", "0"), ("base", "wincap")])
+    counters.for_worker(0).record_sim("base", "wincap", attempts=5, nanoseconds=3 * 10**9)
+    counters.for_worker(1).record_sim("base", "wincap", attempts=1, nanoseconds=10**9)
+    assert counters.get_criteria_seconds() == {"base:0": (0, 0.0), "base:wincap": (2, 4.0)}
+
+
+def test_reporter_flags_slow_workers(tmp_path):
+    """Workers well below the median throughput are reported, metrics are appended as jsonl."""
+    metrics_file = os.path.join(tmp_path, "metrics.jsonl")
+    counters = SimCounters(3, [("base", "0")])
+    reporter = ProgressReporter(counters, total_sims=100, interval=60, metrics_file=metrics_file)
+    reporter.start()
+    for worker, num_sims in enumerate([20, 20, 2]):
+        worker_counters = counters.for_worker(worker)
+        for _ in range(num_sims):
+            worker_counters.record_sim("base", "0", attempts=1)
+    reporter.report()
+    reporter.stop()
+
+    with open(metrics_file, "r", encoding="UTF-8") as f:
+        metrics = [json.loads(line) for line in f]
+    assert metrics[0]["sims"] == 42 and metrics[0]["stragglers"] == [2]
+    assert metrics[-1]["final"]
@@ -0,0 +1,127 @@
+"""Test workers are forked without other threads, the pool stops when a worker or the main process fails, and retired
+workers exit."""
+
+import os
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from src.state.run_sims import get_sim_tasks, run_sim_pool, run_sim_worker
+from src.state.scheduler import CostOrderedScheduler
+from src.state.speculation import SpeculationBoard
+from src.state.telemetry import ProgressReporter, SimCounters
+
+NUM_SHARDS = 200
+TASK_SECONDS = 0.02
+# thread counts of the parent process at each fork, recorded while a test sets FORK_THREAD_COUNTS["enabled"]
+FORK_THREAD_COUNTS = {"enabled": False, "counts": []}
+
+
+def record_fork_thread_count() -> None:
+    """Called in the parent before every fork."""
+    if FORK_THREAD_COUNTS["enabled"]:
+        FORK_THREAD_COUNTS["counts"].append(threading.active_count())
+
+
+os.register_at_fork(before=record_fork_thread_count)
+
+
+class ShardFiles:
+    """Every shard reports the same existing temp books file."""
+
+    def __init__(self, books_file: str):
+        self.books_file = books_file
+
+    def get_temp_multi_thread_name(self, betmode: str, shard_index: int, compress: bool) -> str:
+        return self.books_file
+
+
+class SleepingGameState:
+    """Gamestate whose shards only sleep, the shard at crash_shard exits its worker."""
+
+    def __init__(self, books_file: str, crash_shard: int = None):
+        self.config = SimpleNamespace(bet_modes=[])
+        self.symbol_storage = None
+        self.reel_symbol_positions = None
+        self.current_betmode = None
+        self.current_distribution = None
+        self.distribution_conditions = None
+        self.output_files = ShardFiles(books_file)
+        self.crash_shard = crash_shard
+
+    def run_sims(self, shard_index: int, **kwargs) -> dict:
+        if shard_index == self.crash_shard:
+            os._exit(3)
+        time.sleep(TASK_SECONDS)
+        return {}
+
+
+def run_pool(tmp_path, on_result, crash_shard: int = None, num_shards: int = NUM_SHARDS, reporter=None) -> None:
+    """Run the sleeping shards on two forked workers."""
+    books_file = tmp_path / "books.jsonl"
+    books_file.write_text("")
+    mode_plans = {"base": ([(0, 1)] * num_shards, None)}
+    run_sim_pool(
+        2,
+        "test",
+        SleepingGameState(str(books_file), crash_shard),
+        mode_plans,
+        get_sim_tasks(mode_plans),
+        on_result,
+        start_method="fork",
+        reporter=reporter,
+    )
+
+
+def test_workers_forked_before_reporter_starts(tmp_path):
+    """No reporting thread is running while workers are forked, the reporter is running once they are started."""
+    reporter = ProgressReporter(SimCounters(2, [("base", "basegame")]), total_sims=4, interval=60)
+    FORK_THREAD_COUNTS.update(enabled=True, counts=[])
+    try:
+        run_pool(tmp_path, lambda result: None, num_shards=4, reporter=reporter)
+    finally:
+        FORK_THREAD_COUNTS["enabled"] = False
+        reporter.stop()
+    assert FORK_THREAD_COUNTS["counts"] == [1, 1]
+    assert reporter.thread is not None
+
+
+def test_worker_exit_stops_remaining_workers(tmp_path):
+    """A worker exiting with an error code stops the pool without waiting for the other worker's shards."""
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        run_pool(tmp_path, lambda result: None, crash_shard=0)
+    assert time.perf_counter() - start < NUM_SHARDS * TASK_SECONDS / 2
+
+
+def test_failing_on_result_stops_workers(tmp_path):
+    """An error while handling a result stops all workers and is raised."""
+
+    def on_result(result: tuple) -> None:
+        raise OSError("disk full")
+
+    start = time.perf_counter()
+    with pytest.raises(OSError, match="disk full"):
+        run_pool(tmp_path, on_result)
+    assert time.perf_counter() - start < NUM_SHARDS * TASK_SECONDS / 2
+
+
+def test_retired_worker_exits_without_helping(tmp_path):
+    """A retired worker runs no shards and leaves speculative attempts to the workers still running shards."""
+    books_file = tmp_path / "books.jsonl"
+    books_file.write_text("")
+    mode_plans = {"base": ([(0, 1)] * 4, None)}
+    tasks = get_sim_tasks(mode_plans)
+    scheduler = CostOrderedScheduler(len(tasks), 2)
+    scheduler.limit_workers(1)
+    board = SpeculationBoard(2, list(mode_plans))
+    result_queue = queue.Queue()
+    gamestate = SleepingGameState(str(books_file))
+    run_sim_worker(gamestate, 1, mode_plans, tasks, scheduler, True, False, result_queue, None, None, board, 2)
+    assert result_queue.empty()
+    assert scheduler.remaining() == len(tasks)
+    assert board.has_busy_workers()
+    board.for_worker(0).worker_done()
+    assert not board.has_busy_workers()
@@ -0,0 +1,77 @@
+"""Simulate a range of a mode as self-describing shard files, or merge shard files into final outputs.
+
+Simulate sims [0, 50000) of a 100000 sim mode on one machine, and [50000, 100000) on another:
+    python utils/shard_sims.py simulate -g 0_0_lines -m base -n 100000 --start 0 --end 50000 -o shards/
+    python utils/shard_sims.py simulate -g 0_0_lines -m base -n 100000 --start 50000 --end 100000 -o shards/
+Once all shard files are copied into one directory:
+    python utils/shard_sims.py merge -g 0_0_lines -i shards/
+"""
+
+from pathlib import Path
+import argparse
+import importlib
+import sys
+import os
+
+ABS_PATH = Path(__file__).parent.parent
+sys.path.append(str(ABS_PATH))
+
+from src.config.paths import PATH_TO_GAMES
+from src.state.distributed import merge_sim_shards, simulate_sim_range
+
+
+def load_game(game_id: str):
+    """Construct the config and gamestate of a game."""
+    sys.path.insert(0, os.path.join(PATH_TO_GAMES, game_id))
+    config = importlib.import_module("game_config").GameConfig()
+    gamestate = importlib.import_module("gamestate").GameState(config)
+    return gamestate, config
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    simulate_parser = subparsers.add_parser("simulate", help="Simulate a range of sims within a mode.")
+    simulate_parser.add_argument(
+        "-g", dest="game_id", type=str, required=True, help="Enter str format for game_id: '0_0_0'"
+    )
+    simulate_parser.add_argument(
+        "-m", dest="game_mode", type=str, required=True, help="Enter str format: 'base', 'bonus', etc... "
+    )
+    simulate_parser.add_argument(
+        "-n", dest="num_sims", type=int, required=True, help="Total number of sims in the mode"
+    )
+    simulate_parser.add_argument("--start", dest="start", type=int, required=True, help="First sim in the range")
+    simulate_parser.add_argument(
+        "--end", dest="end", type=int, required=True, help="Sim after the last sim in the range"
+    )
+    simulate_parser.add_argument("-o", dest="shard_dir", type=str, required=True, help="Directory for shard files")
+    simulate_parser.add_argument("-t", dest="threads", type=int, default=1)
+    simulate_parser.add_argument("-b", dest="batch_size", type=int, default=50000)
+    simulate_parser.add_argument("--no-compress", dest="compress", action="store_false")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge shard files into final outputs.")
+    merge_parser.add_argument(
+        "-g", dest="game_id", type=str, required=True, help="Enter str format for game_id: '0_0_0'"
+    )
+    merge_parser.add_argument("-i", dest="shard_dir", type=str, required=True, help="Directory holding shard files")
+
+    arguments = parser.parse_args()
+    gamestate, config = load_game(arguments.game_id)
+
+    if arguments.command == "simulate":
+        simulate_sim_range(
+            gamestate,
+            config,
+            arguments.game_mode,
+            arguments.num_sims,
+            (arguments.start, arguments.end),
+            arguments.shard_dir,
+            arguments.batch_size,
+            arguments.threads,
+            arguments.compress,
+        )
+    else:
+        merge_sim_shards(gamestate, config, arguments.shard_dir)